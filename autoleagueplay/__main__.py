@@ -1,7 +1,14 @@
 """AutoLeague
 
 Usage:
-    autoleagueplay (odd | even | bubble) <ladder> [--replays=R] [--teamsize=T] [--list|--results]
+    autoleagueplay (odd | even | bubble | watch | bracket) <ladder> [--replays=R] [--teamsize=T] [--reuse-bots] [--mercy=G] [--mercy-rate=R] [--series=N] [--confidence=C] [--stall-timeout=S] [--time-limit=M] [--cores=C] [--sample-resources] [--max-stalled=P] [--replay-poor-pacing] [--odd-even] [--poll=S] [--debounce=S] [--predict=P] [--check-rate=R] [--event=E] [--double] [--size=N] [--list|--results]
+    autoleagueplay plan (odd | even | bubble) <ladder> [--json]
+    autoleagueplay standings <ladder> [--json]
+    autoleagueplay export <ladder> [--output=O]
+    autoleagueplay history <ladder> [--at=D] [--since=D]
+    autoleagueplay resources <ladder> [--json]
+    autoleagueplay replays <ladder> [--replay-dir=D] [--rebuild]
+    autoleagueplay archive <ladder> [--replay-dir=D] [--budget=GB] [--protect=P]
     autoleagueplay fetch <week_num> <league_dir>
     autoleagueplay (-h | --help)
     autoleagueplay --version
@@ -9,30 +16,69 @@ Usage:
 Options:
     --replays=R                  What to do with the replays of the match. Valid values are 'save', and 'calculated_gg'. [default: calculated_gg]
     --teamsize=T                 How many players per team. [default: 1]
+    --reuse-bots                 Keep a bot's process alive between matches when it plays in the same slot again.
+    --mercy=G                    End a match early when a team leads by G goals.
+    --mercy-rate=R               End a match early when the trailing team would need more than R goals per minute to catch up.
+    --series=N                   In a bubble sort, compare bots in a series of up to N games. [default: 1]
+    --confidence=C               Stop a series early when the better bot is known with this confidence. [default: 0.95]
+    --stall-timeout=S            Retry a match if the game time does not progress for S seconds. [default: 60]
+    --time-limit=M               Retry a match if it takes more than M minutes in total. [default: 30]
+    --cores=C                    Pin the bots to the C highest cores, leaving the lowest cores to Rocket League.
+    --sample-resources           Store the CPU time, memory and threads used by the bots next to each match result.
+    --max-stalled=P              Flag a match as having poor frame pacing if the game clock stalled for more than P percent of it. [default: 5]
+    --replay-poor-pacing         Play a match with poor frame pacing again, up to 3 attempts.
+    --odd-even                   Do the bubble sort in phases of non-overlapping pairs of neighbours, which don't depend on each other.
+    --poll=S                     When watching, check the bots repository for new commits every S seconds. [default: 60]
+    --debounce=S                 When watching, wait until the bots repository has not changed for S seconds before placing bots. [default: 120]
+    --predict=P                  In a bubble sort, don't play comparisons whose winner the head-to-head history predicts with probability P, e.g. 0.99.
+    --check-rate=R               Play this fraction of the predicted comparisons anyway, to check the predictions. [default: 0.1]
+    --event=E                    The name of the bracket event. Results of the same event are resumed. [default: event]
+    --double                     Play a double elimination bracket instead of a single elimination bracket.
+    --size=N                     Seed the bracket with the top N bots of the ladder instead of all of them.
     --list                       Instead of playing the matches, the list of matches is printed.
     --results                    Like --list but also shows the result of matches that has been played.
+    --json                       Print the standings, plan or resource report as lines of JSON instead of tables.
+    --output=O                   Where to export the results to. Defaults to <ladder>_results.csv.gz next to the ladder.
+    --at=D                       Show the ladder as it was at this ISO date, e.g. 2019-05-20T18:00. Defaults to now.
+    --since=D                    Show how much bots have moved since this ISO date. Defaults to a week before --at.
+    --replay-dir=D               Where to look for replays. Defaults to the replay folder of Rocket League.
+    --rebuild                    Make the missing results of league play matches from their replays.
+    --budget=GB                  Remove the replays of the oldest matches when the replay archive uses more than GB gigabytes.
+    --protect=P                  Comma separated patterns of result names whose replays are never removed from the archive, e.g. 'quantum_*'.
     -h --help                    Show this screen.
     --version                    Show version.
 """
 
 import sys
+from datetime import datetime
 from pathlib import Path
 
 from docopt import docopt
 
-from autoleagueplay.bubble_sort import run_bubble_sort
-from autoleagueplay.list_matches import list_matches
 from autoleagueplay.paths import WorkingDir
-from autoleagueplay.replays import ReplayPreference
-from autoleagueplay.run_matches import run_league_play
-from autoleagueplay.sheets import fetch_ladder_from_sheets
 from autoleagueplay.version import __version__
 
+# Each command imports the modules it needs when it runs. This keeps startup fast, and lets commands that only look at
+# results (--list, --results, plan, standings, export, history, resources, replays, archive) run without rlbot and
+# the Google API client installed.
+# Check with `python -m autoleagueplay.startup_benchmark`.
+
 
 def main():
     arguments = docopt(__doc__, version=__version__)
 
-    if arguments['odd'] or arguments['even'] or arguments['bubble']:
+    if arguments['plan']:
+
+        ladder_path = Path(arguments['<ladder>'])
+        if not ladder_path.exists():
+            print(f'\'{ladder_path}\' does not exist.')
+            sys.exit(1)
+
+        from autoleagueplay.planner import print_plan
+        mode = 'odd' if arguments['odd'] else 'even' if arguments['even'] else 'bubble'
+        print_plan(WorkingDir(ladder_path), mode, arguments['--json'])
+
+    elif arguments['odd'] or arguments['even'] or arguments['bubble'] or arguments['watch'] or arguments['bracket']:
 
         ladder_path = Path(arguments['<ladder>'])
         if not ladder_path.exists():
@@ -41,17 +87,149 @@ def main():
 
         working_dir = WorkingDir(ladder_path)
 
+        if arguments['--results'] or arguments['--list']:
+            from autoleagueplay.list_matches import list_matches
+            list_matches(working_dir, arguments['odd'], arguments['--results'])
+            return
+
+        from autoleagueplay.match_exercise import MercyRule
+        from autoleagueplay.replays import ReplayPreference
+
         replay_preference = ReplayPreference(arguments['--replays'])
         team_size = int(arguments['--teamsize'])
+        mercy_rule = None
+        if arguments['--mercy'] or arguments['--mercy-rate']:
+            mercy_rule = MercyRule(
+                goal_diff=int(arguments['--mercy']) if arguments['--mercy'] else None,
+                max_goals_per_minute=float(arguments['--mercy-rate']) if arguments['--mercy-rate'] else None,
+            )
+        stall_timeout = float(arguments['--stall-timeout'])
+        time_limit = float(arguments['--time-limit']) * 60
+
+        from autoleagueplay.scheduler import ResourceBudget
+        budget = ResourceBudget.from_core_count(int(arguments['--cores']) if arguments['--cores'] else None)
+        from autoleagueplay.frame_pacing import PacingPolicy
+        pacing_policy = PacingPolicy(max_stalled_ratio=float(arguments['--max-stalled']) / 100,
+                                     replay_poor_matches=arguments['--replay-poor-pacing'])
+
+        if arguments['bubble'] or arguments['watch']:
+            from autoleagueplay.series import SeriesPolicy
+            series_policy = SeriesPolicy(max_games=int(arguments['--series']),
+                                         confidence=float(arguments['--confidence']))
+            from autoleagueplay.head_to_head import PredictionPolicy
+            prediction_policy = None
+            if arguments['--predict']:
+                prediction_policy = PredictionPolicy(confidence=float(arguments['--predict']),
+                                                     check_rate=float(arguments['--check-rate']))
 
-        if arguments['--results']:
-            list_matches(working_dir, arguments['odd'], True)
-        elif arguments['--list']:
-            list_matches(working_dir, arguments['odd'], False)
+        if arguments['watch']:
+            from autoleagueplay.ranking_daemon import run_ranking_daemon
+            run_ranking_daemon(working_dir, team_size, replay_preference, arguments['--reuse-bots'], mercy_rule,
+                               series_policy, stall_timeout, time_limit, budget, arguments['--sample-resources'],
+                               pacing_policy, float(arguments['--poll']), float(arguments['--debounce']),
+                               prediction_policy)
+        elif arguments['bracket']:
+            from autoleagueplay.bracket import run_bracket
+            run_bracket(working_dir, team_size, replay_preference, arguments['--event'], arguments['--double'],
+                        int(arguments['--size']) if arguments['--size'] else None, arguments['--reuse-bots'],
+                        mercy_rule, stall_timeout, time_limit, budget, arguments['--sample-resources'],
+                        pacing_policy)
         elif arguments['bubble']:
-            run_bubble_sort(working_dir, team_size, replay_preference)
+            from autoleagueplay.bubble_sort import run_bubble_sort
+            run_bubble_sort(working_dir, team_size, replay_preference, arguments['--reuse-bots'], mercy_rule,
+                            series_policy, stall_timeout, time_limit, budget, arguments['--sample-resources'],
+                            pacing_policy, arguments['--odd-even'], prediction_policy)
         else:
-            run_league_play(working_dir, arguments['odd'], replay_preference, team_size)
+            from autoleagueplay.run_matches import run_league_play
+            run_league_play(working_dir, arguments['odd'], replay_preference, team_size, arguments['--reuse-bots'],
+                            mercy_rule, stall_timeout, time_limit, budget, arguments['--sample-resources'],
+                            pacing_policy)
+
+    elif arguments['standings']:
+
+        ladder_path = Path(arguments['<ladder>'])
+        if not ladder_path.exists():
+            print(f'\'{ladder_path}\' does not exist.')
+            sys.exit(1)
+
+        from autoleagueplay.standings import print_standings
+        print_standings(WorkingDir(ladder_path), arguments['--json'])
+
+    elif arguments['export']:
+
+        ladder_path = Path(arguments['<ladder>'])
+        if not ladder_path.exists():
+            print(f'\'{ladder_path}\' does not exist.')
+            sys.exit(1)
+
+        from autoleagueplay.export import export_results
+        working_dir = WorkingDir(ladder_path)
+        export_path = Path(arguments['--output']) if arguments['--output'] else working_dir.results_export
+        try:
+            count = export_results(working_dir, export_path)
+        except FileExistsError as e:
+            print(e)
+            sys.exit(1)
+        print(f'Exported {count} new results to \'{export_path}\'')
+
+    elif arguments['history']:
+
+        ladder_path = Path(arguments['<ladder>'])
+        if not ladder_path.exists():
+            print(f'\'{ladder_path}\' does not exist.')
+            sys.exit(1)
+
+        from autoleagueplay.ladder_history import print_ladder_history
+        at = datetime.fromisoformat(arguments['--at']) if arguments['--at'] else None
+        since = datetime.fromisoformat(arguments['--since']) if arguments['--since'] else None
+        print_ladder_history(WorkingDir(ladder_path), at, since)
+
+    elif arguments['resources']:
+
+        ladder_path = Path(arguments['<ladder>'])
+        if not ladder_path.exists():
+            print(f'\'{ladder_path}\' does not exist.')
+            sys.exit(1)
+
+        from autoleagueplay.resource_usage import print_resource_report
+        print_resource_report(WorkingDir(ladder_path), arguments['--json'])
+
+    elif arguments['replays']:
+
+        ladder_path = Path(arguments['<ladder>'])
+        if not ladder_path.exists():
+            print(f'\'{ladder_path}\' does not exist.')
+            sys.exit(1)
+
+        from autoleagueplay.paths import ROCKET_LEAGUE_REPLAY_DIR
+        replay_dir = Path(arguments['--replay-dir']) if arguments['--replay-dir'] else ROCKET_LEAGUE_REPLAY_DIR
+        if not replay_dir.is_dir():
+            print(f'\'{replay_dir}\' does not exist.')
+            sys.exit(1)
+
+        from autoleagueplay.replay_index import index_replays
+        index_replays(WorkingDir(ladder_path), replay_dir, arguments['--rebuild'])
+
+    elif arguments['archive']:
+
+        ladder_path = Path(arguments['<ladder>'])
+        if not ladder_path.exists():
+            print(f'\'{ladder_path}\' does not exist.')
+            sys.exit(1)
+
+        from autoleagueplay.paths import ROCKET_LEAGUE_REPLAY_DIR
+        replay_dir = Path(arguments['--replay-dir']) if arguments['--replay-dir'] else ROCKET_LEAGUE_REPLAY_DIR
+        if not replay_dir.is_dir():
+            print(f'\'{replay_dir}\' does not exist.')
+            sys.exit(1)
+
+        from autoleagueplay.replay_archive import RetentionPolicy, archive_replays
+        policy = RetentionPolicy(
+            budget_bytes=int(float(arguments['--budget']) * 1024 ** 3) if arguments['--budget'] else None,
+            protected_patterns=[pattern.strip() for pattern in arguments['--protect'].split(',')]
+            if arguments['--protect'] else [],
+        )
+        archive_replays(WorkingDir(ladder_path), replay_dir, policy)
 
     elif arguments['fetch']:
         week_num = int(arguments['<week_num>'])
@@ -65,6 +243,7 @@ def main():
         league_dir.mkdir(exist_ok=True)
         ladder_path = league_dir / 'ladder.txt'
 
+        from autoleagueplay.sheets import fetch_ladder_from_sheets
         ladder = fetch_ladder_from_sheets(week_num)
         ladder.write(ladder_path)
 
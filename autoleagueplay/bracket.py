@@ -0,0 +1,279 @@
+import json
+import math
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from autoleagueplay.frame_pacing import PacingPolicy
+from autoleagueplay.ladder import Ladder
+from autoleagueplay.load_bots import load_all_bots
+from autoleagueplay.match_configurations import make_match_config
+from autoleagueplay.match_exercise import MercyRule
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.replays import ReplayPreference
+from autoleagueplay.resource_usage import write_resource_usage
+from autoleagueplay.run_matches import MatchRunner
+from autoleagueplay.scheduler import MatchJob, MatchScheduler, ResourceBudget
+
+# Where a participant of a bracket match comes from: ['seed', index], ['winner', match_id] or ['loser', match_id]
+Source = Tuple[str, object]
+
+
+@dataclass
+class BracketMatch:
+    """
+    A match in a bracket. A grand final reset is only played if the champion of the losers bracket won the grand final.
+    """
+
+    match_id: str
+    round_name: str
+    blue_source: Source
+    orange_source: Source
+    reset: bool = False
+
+
+@dataclass
+class MatchOutcome:
+    """
+    The participants of a bracket match, once they are known, and its winner and loser, once it is decided. A
+    participant is None if it is a bye, in which case the other participant wins without playing.
+    """
+
+    blue: Optional[str]
+    orange: Optional[str]
+    winner: Optional[str] = None
+    loser: Optional[str] = None
+    decided: bool = False
+
+
+def seed_order(size: int) -> List[int]:
+    """
+    Returns the seed indices in the order they are placed in the first round of a bracket of the given power of two
+    size, such that neighbours play each other and the best seeds meet as late as possible, e.g. [0, 3, 1, 2] for 4.
+    """
+    order = [0]
+    while len(order) < size:
+        order = [seed for index in order for seed in (index, 2 * len(order) - 1 - index)]
+    return order
+
+
+def make_bracket(bot_count: int, double_elimination: bool) -> List[BracketMatch]:
+    """
+    Returns the matches of a bracket in an order where every match comes after the matches it depends on. The bracket
+    is the next power of two in size, and the missing seeds are byes, so the best seeds get the byes.
+    """
+    size = 2 ** math.ceil(math.log2(max(2, bot_count)))
+    matches = []
+
+    def add_round(round_name: str, prefix: str, pairs: List[Tuple[Source, Source]]) -> List[str]:
+        match_ids = []
+        for i, (blue_source, orange_source) in enumerate(pairs):
+            match_id = f'{prefix}-{i + 1}'
+            matches.append(BracketMatch(match_id, round_name, blue_source, orange_source))
+            match_ids.append(match_id)
+        return match_ids
+
+    def pair_up(sources: List[Source]) -> List[Tuple[Source, Source]]:
+        return [(sources[i], sources[i + 1]) for i in range(0, len(sources), 2)]
+
+    # Winners bracket
+    sources = [('seed', index) for index in seed_order(size)]
+    winners_bracket_losers = []
+    winners_round = 0
+    while len(sources) > 1:
+        winners_round += 1
+        match_ids = add_round(f'Winners round {winners_round}', f'W{winners_round}', pair_up(sources))
+        sources = [('winner', match_id) for match_id in match_ids]
+        winners_bracket_losers.append([('loser', match_id) for match_id in match_ids])
+    if not double_elimination:
+        return matches
+    winners_champion = sources[0]
+
+    # Losers bracket. Each round where losers from the winners bracket drop in is followed by a round among the
+    # survivors. The drops are reversed every other round, so bots don't meet the same opponents again right away
+    sources = winners_bracket_losers[0]
+    losers_round = 0
+    if len(sources) > 1:
+        losers_round += 1
+        sources = [('winner', match_id) for match_id in
+                   add_round(f'Losers round {losers_round}', f'L{losers_round}', pair_up(sources))]
+    for index, drops in enumerate(winners_bracket_losers[1:]):
+        drops = drops[::-1] if index % 2 == 0 else drops
+        losers_round += 1
+        sources = [('winner', match_id) for match_id in
+                   add_round(f'Losers round {losers_round}', f'L{losers_round}', list(zip(sources, drops)))]
+        if len(sources) > 1:
+            losers_round += 1
+            sources = [('winner', match_id) for match_id in
+                       add_round(f'Losers round {losers_round}', f'L{losers_round}', pair_up(sources))]
+    losers_champion = sources[0]
+
+    matches.append(BracketMatch('GF', 'Grand final', winners_champion, losers_champion))
+    matches.append(BracketMatch('GF2', 'Grand final reset', ('winner', 'GF'), ('loser', 'GF'), reset=True))
+    return matches
+
+
+class Bracket:
+    """
+    A single or double elimination bracket seeded by the given bots, best first.
+    """
+
+    def __init__(self, seeds: List[str], double_elimination: bool):
+        self.seeds = seeds
+        self.double_elimination = double_elimination
+        self.matches = make_bracket(len(seeds), double_elimination)
+
+    def resolve(self, get_winner: Callable[[BracketMatch, str, str], Optional[str]]) -> Dict[str, MatchOutcome]:
+        """
+        Works out the outcome of every match as far as it is known. get_winner returns the winner of a match between
+        the two bots, or None if it has not been played yet. Matches whose participants are not known yet are left
+        out.
+        """
+        outcomes = {}
+        for match in self.matches:
+            blue, blue_known = self.get_participant(match.blue_source, outcomes)
+            orange, orange_known = self.get_participant(match.orange_source, outcomes)
+            if not blue_known or not orange_known:
+                continue
+            outcome = MatchOutcome(blue, orange)
+            outcomes[match.match_id] = outcome
+
+            if match.reset and outcomes['GF'].winner == outcomes['GF'].blue:
+                # The champion of the winners bracket won the grand final, so there is no reset
+                outcome.winner, outcome.decided = outcome.blue, True
+            elif blue is None or orange is None:
+                outcome.winner, outcome.decided = blue or orange, True
+            else:
+                outcome.winner = get_winner(match, blue, orange)
+                outcome.decided = outcome.winner is not None
+                if outcome.decided:
+                    outcome.loser = orange if outcome.winner == blue else blue
+        return outcomes
+
+    def get_participant(self, source: Source, outcomes: Dict[str, MatchOutcome]) -> Tuple[Optional[str], bool]:
+        """
+        Returns the bot coming from the source, and whether it is known yet.
+        """
+        kind, value = source
+        if kind == 'seed':
+            return (self.seeds[value] if value < len(self.seeds) else None), True
+        outcome = outcomes.get(value)
+        if outcome is None or not outcome.decided:
+            return None, False
+        return (outcome.winner if kind == 'winner' else outcome.loser), True
+
+    def get_ready_matches(self, outcomes: Dict[str, MatchOutcome]) -> List[BracketMatch]:
+        """
+        Returns the matches that can be played now. They never share a bot, so they can be played in any order.
+        """
+        return [match for match in self.matches
+                if match.match_id in outcomes and not outcomes[match.match_id].decided]
+
+    def get_champion(self, outcomes: Dict[str, MatchOutcome]) -> Optional[str]:
+        final = outcomes.get(self.matches[-1].match_id)
+        return final.winner if final is not None and final.decided else None
+
+    def write(self, path: Path, event: str, outcomes: Dict[str, MatchOutcome]):
+        """
+        Writes the seeds and the state of every match, so the event can be resumed with the same seeds, and so an
+        overlay can show the bracket.
+        """
+        with open(path, 'w') as f:
+            json.dump({
+                'event': event,
+                'double_elimination': self.double_elimination,
+                'seeds': self.seeds,
+                'champion': self.get_champion(outcomes),
+                'matches': [
+                    {'match_id': match.match_id, 'round': match.round_name, **outcomes[match.match_id].__dict__}
+                    for match in self.matches if match.match_id in outcomes
+                ],
+            }, f, indent=4)
+
+    @staticmethod
+    def read(path: Path) -> 'Bracket':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return Bracket(data['seeds'], data['double_elimination'])
+
+
+def run_bracket(working_dir: WorkingDir, team_size: int, replay_preference: ReplayPreference, event: str,
+                double_elimination: bool=False, size: int=None, reuse_bot_processes: bool=False,
+                mercy_rule: MercyRule=None, stall_timeout: float=60, time_limit: float=30 * 60,
+                budget: ResourceBudget=None, sample_resources: bool=False, pacing_policy: PacingPolicy=None):
+    """
+    Runs an elimination bracket seeded by the ladder, or by the top size bots of the ladder. The seeds are stored the
+    first time, so an event can be resumed with the results that were already played, even if the ladder changed.
+    All matches that can be played are played in waves, so an event with N bots takes a number of waves that grows
+    with log(N).
+    """
+    bracket_path = working_dir.get_bracket(event)
+    if bracket_path.exists():
+        bracket = Bracket.read(bracket_path)
+        print(f'Resuming {event} with {len(bracket.seeds)} bots')
+    else:
+        ladder = Ladder.read(working_dir.ladder)
+        bracket = Bracket(ladder.bots[:size] if size else ladder.bots, double_elimination)
+        print(f'Starting {event} with {len(bracket.seeds)} bots')
+
+    bots = load_all_bots(working_dir)
+    budget = budget or ResourceBudget()
+
+    def get_winner(match: BracketMatch, blue: str, orange: str) -> Optional[str]:
+        result_path = working_dir.get_bracket_match_result(event, match.match_id, blue, orange)
+        if not result_path.exists():
+            return None
+        result = MatchResult.read(result_path)
+        # A tie is won by blue, which is the better seed in the first round
+        return blue if result.blue_goals >= result.orange_goals else orange
+
+    with MatchRunner(reuse_bot_processes, mercy_rule, stall_timeout, time_limit,
+                     recovery_log=working_dir.match_recoveries, cores=budget.cores,
+                     pacing_policy=pacing_policy, sample_resources=sample_resources) as match_runner:
+        scheduler = MatchScheduler(match_runner, replay_preference)
+
+        outcomes = bracket.resolve(get_winner)
+        while bracket.get_champion(outcomes) is None:
+            bracket.write(bracket_path, event, outcomes)
+            ready = bracket.get_ready_matches(outcomes)
+            print(f'Playing {", ".join(match.match_id for match in ready)}')
+            jobs = [
+                MatchJob(
+                    blue=bots[outcomes[match.match_id].blue].name,
+                    orange=bots[outcomes[match.match_id].orange].name,
+                    match_config=make_match_config(bots[outcomes[match.match_id].blue],
+                                                   bots[outcomes[match.match_id].orange], team_size),
+                    result_path=working_dir.get_bracket_match_result(event, match.match_id,
+                                                                     outcomes[match.match_id].blue,
+                                                                     outcomes[match.match_id].orange),
+                    team_size=team_size,
+                )
+                for match in ready
+            ]
+
+            played_count = 0
+            for job, result, usage in scheduler.run(jobs):
+                if result is None:
+                    # Played again in the next wave
+                    print(f'Could not play {job.result_path.name}')
+                    continue
+                played_count += 1
+                result.write(job.result_path)
+                if sample_resources:
+                    write_resource_usage(working_dir.get_resource_usage(job.result_path), result, usage)
+                print(f'Match finished {result.blue_goals}-{result.orange_goals}. Saved result as {job.result_path}')
+                # Let the winner celebrate and the scoreboard show for a few seconds
+                time.sleep(8)
+
+            if played_count == 0:
+                print('None of the matches could be played. Run the script again to resume the event.')
+                break
+            outcomes = bracket.resolve(get_winner)
+
+        bracket.write(bracket_path, event, outcomes)
+
+    champion = bracket.get_champion(outcomes)
+    if champion is not None:
+        print(f'{champion} won {event}!')
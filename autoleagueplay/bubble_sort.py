@@ -1,3 +1,4 @@
+import random
 import subprocess
 import sys
 import time
@@ -5,16 +6,25 @@ from dataclasses import dataclass
 from datetime import datetime
 from os.path import relpath
 from time import sleep
+from typing import Dict, List, Optional, Tuple
 
 from rlbot.parsing.directory_scanner import scan_directory_for_bot_configs
 
 from autoleagueplay.bubble_sort_overlay import BubbleSortOverlayData
+from autoleagueplay.frame_pacing import PacingPolicy
+from autoleagueplay.head_to_head import HeadToHeadModel, InferredDecision, InferredDecisionLog, PredictionPolicy
 from autoleagueplay.ladder import Ladder
+from autoleagueplay.ladder_history import LadderHistory
+from autoleagueplay.logo_cache import LogoCache
 from autoleagueplay.match_configurations import make_match_config
+from autoleagueplay.match_exercise import MercyRule
 from autoleagueplay.match_result import MatchResult
 from autoleagueplay.paths import WorkingDir
 from autoleagueplay.replays import ReplayPreference
-from autoleagueplay.run_matches import run_match
+from autoleagueplay.resource_usage import write_resource_usage
+from autoleagueplay.run_matches import MatchRunner
+from autoleagueplay.scheduler import MatchJob, MatchScheduler, ResourceBudget
+from autoleagueplay.series import SeriesPolicy, get_goal_diff, get_series_winner
 from autoleagueplay.versioned_bot import VersionedBot
 
 
@@ -27,13 +37,27 @@ class SortStepOutcome:
 class BubbleSorter:
 
     def __init__(self, ladder: Ladder, working_dir: WorkingDir, team_size: int,
-                 replay_preference: ReplayPreference):
+                 replay_preference: ReplayPreference, match_runner: MatchRunner=None,
+                 series_policy: SeriesPolicy=None, sample_resources: bool=False, scheduler: MatchScheduler=None,
+                 prediction_policy: PredictionPolicy=None):
         self.ladder = ladder
         self.working_dir = working_dir
         self.team_size = team_size
         self.replay_preference = replay_preference
+        self.match_runner = match_runner or MatchRunner()
+        self.series_policy = series_policy or SeriesPolicy()
+        self.sample_resources = sample_resources
+        self.scheduler = scheduler or MatchScheduler(self.match_runner, replay_preference)
+        self.ladder_history = LadderHistory(working_dir.ladder_history)
+        self.prediction_policy = prediction_policy
+        self.head_to_head = HeadToHeadModel.from_results(working_dir) if prediction_policy is not None else None
+        self.inferred_decisions = InferredDecisionLog(working_dir.inferred_decisions)
+        # Predictions that were picked to be checked, by the pair of versions, until their series is played
+        self.predictions_to_check: Dict[Tuple[str, str], InferredDecision] = {}
         self.bundle_map = {}
         self.versioned_bots_by_name = {}
+        self.logo_cache = LogoCache(working_dir.logo_cache)
+        self.logo_sheet = None
         self.num_already_played_during_iteration = 0
 
     def try_gather_versioned_bots(self):
@@ -73,6 +97,7 @@ class BubbleSorter:
             vb.get_unversioned_key(): vb
             for vb in versioned_bots
         }
+        self.logo_sheet = self.logo_cache.build(self.versioned_bots_by_name)
 
         bots_available = set([vb.get_unversioned_key() for vb in versioned_bots])
         incoming_bots = bots_available.difference(set(self.ladder.bots))
@@ -80,6 +105,7 @@ class BubbleSorter:
         self.ladder.bots = [bot for bot in self.ladder.bots if bot in bots_available]
 
         self.ladder.write(self.working_dir.ladder)
+        self.ladder_history.record(self.ladder)
 
     def begin(self):
         self.gather_versioned_bots()
@@ -95,13 +121,17 @@ class BubbleSorter:
                 break
             next_index = step_outcome.upper_index
 
-        overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, 0, False,
-                                             self.working_dir._working_dir, winner=self.ladder.bots[0],
-                                             sort_complete=True)
+        self.write_overlay(0, False, winner=self.ladder.bots[0], sort_complete=True)
+
+    def write_overlay(self, sort_index: int, needs_match: bool, winner: str=None, sort_complete: bool=False,
+                      sort_indices: List[int]=None):
+        overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, sort_index, needs_match,
+                                             self.working_dir._working_dir, winner, sort_complete, sort_indices,
+                                             self.logo_sheet)
         overlay_data.write(self.working_dir.overlay_interface)
 
-    def get_past_result(self, bot_1, bot_2) -> MatchResult:
-        path = self.get_result_path(bot_1, bot_2)
+    def get_past_result(self, bot_1, bot_2, game_index: int=0) -> MatchResult:
+        path = self.get_result_path(bot_1, bot_2, game_index)
         if path.exists():
             try:
                 print(f'Found existing result {path.name}')
@@ -111,25 +141,90 @@ class BubbleSorter:
                 raise e
         return None
 
-    def get_result_path(self, bot_1, bot_2):
+    def get_past_results(self, bot_1, bot_2) -> List[MatchResult]:
+        """
+        Returns the results of the games already played in the series between the two bots.
+        """
+        results = []
+        for game_index in range(self.series_policy.max_games):
+            result = self.get_past_result(bot_1, bot_2, game_index)
+            if result is None:
+                break
+            results.append(result)
+        return results
+
+    def get_result_path(self, bot_1, bot_2, game_index: int=0):
         versioned_bot_1 = self.versioned_bots_by_name[bot_1]
         versioned_bot_2 = self.versioned_bots_by_name[bot_2]
-        return self.working_dir.get_version_specific_match_result(versioned_bot_1, versioned_bot_2)
-
-    def _on_match_complete(self, result):
-
-        winner = result.winner.lower()
-        loser = result.loser.lower()
-
-        winner_index = self.ladder.bots.index(winner)
-        loser_index = self.ladder.bots.index(loser)
+        return self.working_dir.get_version_specific_match_result(versioned_bot_1, versioned_bot_2, game_index)
+
+    def is_series_decided(self, bot, results: List[MatchResult]) -> bool:
+        return self.series_policy.is_decided([get_goal_diff(bot, result) for result in results])
+
+    def infer_winner(self, next_above: str, next_below: str) -> Optional[str]:
+        """
+        Returns the winner of a comparison predicted by the head-to-head history, or None if it must be played. A
+        prediction made earlier for the same versions is reused. Some confident predictions are picked to be checked,
+        in which case None is returned and the prediction is logged with the actual winner once the series is played.
+        """
+        if self.prediction_policy is None:
+            return None
+        upper_version = self.versioned_bots_by_name[next_above].get_key()
+        lower_version = self.versioned_bots_by_name[next_below].get_key()
+        earlier = self.inferred_decisions.get(upper_version, lower_version)
+        if earlier is not None:
+            return earlier.predicted
+
+        probability = self.head_to_head.win_probability(next_below, next_above)
+        if probability >= self.prediction_policy.confidence:
+            predicted, loser = next_below, next_above
+        elif 1 - probability >= self.prediction_policy.confidence:
+            predicted, loser, probability = next_above, next_below, 1 - probability
+        else:
+            return None
+        wins, losses = self.head_to_head.get_record(predicted, loser)
+        decision = InferredDecision(upper_version, lower_version, predicted, probability, wins, losses)
+
+        if random.random() < self.prediction_policy.check_rate:
+            print(f'Predicted {predicted} to beat {loser} ({wins}-{losses}), but playing it to check')
+            decision.checked = True
+            self.predictions_to_check[decision.get_key()] = decision
+            return None
+        print(f'Inferred that {predicted} beats {loser} from their head-to-head record ({wins}-{losses})')
+        self.inferred_decisions.record(decision)
+        return predicted
+
+    def store_result(self, result_path, match_result: MatchResult, usage):
+        match_result.write(result_path)
+        if self.sample_resources:
+            write_resource_usage(self.working_dir.get_resource_usage(result_path), match_result, usage)
+        if self.head_to_head is not None:
+            self.head_to_head.add(match_result)
+
+    def check_prediction(self, winner: str, loser: str):
+        """
+        Logs the actual winner of a comparison that was predicted, but played to check the prediction.
+        """
+        versions = (self.versioned_bots_by_name[winner].get_key(), self.versioned_bots_by_name[loser].get_key())
+        decision = self.predictions_to_check.pop(tuple(sorted(versions)), None)
+        if decision is not None:
+            decision.actual = winner
+            self.inferred_decisions.record(decision)
+            if decision.predicted != winner:
+                print(f'Prediction was wrong: {winner} beat {loser}')
+
+    def _on_match_complete(self, winner: str, loser: str):
+        self.check_prediction(winner, loser)
+
+        winner_index = self.ladder.rank_of(winner)
+        loser_index = self.ladder.rank_of(loser)
 
         if winner_index > loser_index:
             # Need to swap the indices!
-            self.ladder.bots[loser_index] = winner
-            self.ladder.bots[winner_index] = loser
+            self.ladder.swap(loser_index, winner_index)
 
         self.ladder.write(self.working_dir.ladder)
+        self.ladder_history.record(self.ladder)
 
     def advance(self, upper_index) -> SortStepOutcome:
 
@@ -149,40 +244,207 @@ class BubbleSorter:
             next_below = self.ladder.bots[upper_index]
             upper_index -= 1
 
-        past_result = self.get_past_result(next_above, next_below)
+        past_results = self.get_past_results(next_above, next_below)
+        inferred_winner = self.infer_winner(next_above, next_below) if len(past_results) == 0 else None
 
-        if past_result is not None:
+        if self.is_series_decided(next_below, past_results) or inferred_winner is not None:
             self.num_already_played_during_iteration += 1
-            overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, upper_index, False,
-                                                 self.working_dir._working_dir)
-            overlay_data.write(self.working_dir.overlay_interface)
-            self._on_match_complete(past_result)
+            self.write_overlay(upper_index, False)
+            winner = inferred_winner or get_series_winner(next_above, next_below, past_results)
+            self._on_match_complete(winner, next_below if winner == next_above else next_above)
             sleep(1)
             return SortStepOutcome(upper_index=upper_index, sort_complete=False)
         else:
-            overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, upper_index, True,
-                                                 self.working_dir._working_dir)
-            overlay_data.write(self.working_dir.overlay_interface)
+            series_results = past_results
+            if not self.play_series(upper_index, series_results):
+                # Counting it as already played makes sure the sort still ends
+                self.num_already_played_during_iteration += 1
+
+            # Ties and series where no game could be played leave the bots where they are
+            winner = get_series_winner(next_above, next_below, series_results) or next_above
+            self._on_match_complete(winner, next_below if winner == next_above else next_above)
+            return SortStepOutcome(upper_index=upper_index, sort_complete=False)
 
-            match_config = make_match_config(self.bundle_map[next_below], self.bundle_map[next_above], self.team_size)
-            match_result = run_match(next_below, next_above, match_config, self.replay_preference)
+    def play_series(self, upper_index: int, series_results: List[MatchResult]) -> bool:
+        """
+        Keeps playing games between the bots at upper_index and upper_index + 1 until their series is decided. The
+        results are added to series_results. Returns False if a match could not be played, in which case the series
+        is decided by the games played so far, or the current order is kept.
+        """
+        next_above = self.ladder.bots[upper_index]
+        next_below = self.ladder.bots[upper_index + 1]
+        while not self.is_series_decided(next_below, series_results):
+            self.write_overlay(upper_index, True)
+
+            match_config = make_match_config(self.bundle_map[next_below], self.bundle_map[next_above],
+                                             self.team_size)
+            match_result = self.match_runner.run_match(next_below, next_above, match_config,
+                                                       self.replay_preference)
+            if match_result is None:
+                return False
+
+            result_path = self.get_result_path(next_below, next_above, len(series_results))
+            self.store_result(result_path, match_result, self.match_runner.last_usage)
+            series_results.append(match_result)
+            self.write_overlay(upper_index, True, winner=match_result.winner.lower())
+            sleep(12)
+        return True
+
+    def compare(self, upper_index: int) -> str:
+        """
+        Decides the series between the bots at upper_index and upper_index + 1, using the existing results of their
+        current versions if there are enough, and swaps them if the lower bot wins. Returns the winner.
+        """
+        next_above = self.ladder.bots[upper_index]
+        next_below = self.ladder.bots[upper_index + 1]
+        series_results = self.get_past_results(next_above, next_below)
+        inferred_winner = self.infer_winner(next_above, next_below) if len(series_results) == 0 else None
+        if inferred_winner is None:
+            self.play_series(upper_index, series_results)
+        # Ties and series where no game could be played leave the bots where they are
+        winner = inferred_winner or get_series_winner(next_above, next_below, series_results) or next_above
+        self._on_match_complete(winner, next_below if winner == next_above else next_above)
+        return winner
+
+    def replace_bot(self, bot: str):
+        """
+        Moves a single bot to its place on an otherwise sorted ladder, e.g. after it was updated. The bot moves up as
+        long as it beats the bot above it, and if it didn't move up, it moves down as long as it loses to the bot below
+        it. New bots start at the bottom, so they only move up.
+        """
+        start_rank = self.ladder.rank_of(bot)
+        rank = start_rank
+        while rank > 0 and self.compare(rank - 1) == bot:
+            rank -= 1
+        if rank == start_rank:
+            while rank < len(self.ladder.bots) - 1 and self.compare(rank) != bot:
+                rank += 1
+
+    def begin_odd_even(self):
+        """
+        Sorts the ladder with odd-even transposition sort. It swaps adjacent bots like bubble sort, but alternates
+        between phases comparing the pairs starting at even and at odd indices. The pairs of a phase don't overlap, so
+        they don't depend on each other, but their matches are still played one at a time.
+        The sort is complete when neither an even nor an odd phase swaps any bots. Since N phases sort N bots, it also
+        ends after N phases in a row that only used existing results.
+        """
+        self.gather_versioned_bots()
+        num_bots = len(self.ladder.bots)
+        if num_bots < 2:
+            raise Exception(f'Need at least 2 bots to run a bubble sort! Found {num_bots}')
 
-            match_result.write(self.get_result_path(next_below, next_above))
-            overlay_data = BubbleSortOverlayData(self.ladder.bots, self.versioned_bots_by_name, upper_index, True,
-                                                 self.working_dir._working_dir, winner=match_result.winner.lower())
-            overlay_data.write(self.working_dir.overlay_interface)
+        phase = 0
+        phases_without_swaps = 0
+        phases_without_matches = 0
+        while phases_without_swaps < 2 and phases_without_matches < num_bots:
+            swapped, played = self.run_phase(phase % 2)
+            phases_without_swaps = 0 if swapped else phases_without_swaps + 1
+            phases_without_matches = 0 if played else phases_without_matches + 1
+            phase += 1
+
+        self.write_overlay(0, False, winner=self.ladder.bots[0], sort_complete=True)
+
+    def run_phase(self, parity: int) -> Tuple[bool, bool]:
+        """
+        Compares the bots at index i and i + 1 for every i with the given parity, and swaps the bots of every pair where
+        the lower bot wins. The ladder is only changed once all pairs are decided.
+        Returns whether any bots were swapped and whether any matches were played.
+        """
+        upper_indices = list(range(parity, len(self.ladder.bots) - 1, 2))
+        if not upper_indices:
+            # E.g. the odd phase of a ladder with 2 bots
+            return False, False
+        series_results = {
+            upper_index: self.get_past_results(self.ladder.bots[upper_index], self.ladder.bots[upper_index + 1])
+            for upper_index in upper_indices
+        }
+        inferred_winners = {
+            upper_index: self.infer_winner(self.ladder.bots[upper_index], self.ladder.bots[upper_index + 1])
+            for upper_index in upper_indices if len(series_results[upper_index]) == 0
+        }
+        undecided = [upper_index for upper_index in upper_indices
+                     if inferred_winners.get(upper_index) is None and
+                     not self.is_series_decided(self.ladder.bots[upper_index + 1], series_results[upper_index])]
+
+        played = False
+        while undecided:
+            self.write_overlay(undecided[0], True, sort_indices=undecided)
+
+            # Every undecided pair plays its next game. The games of a series still depend on each other
+            jobs = {}
+            for upper_index in undecided:
+                above, below = self.ladder.bots[upper_index], self.ladder.bots[upper_index + 1]
+                result_path = self.get_result_path(below, above, len(series_results[upper_index]))
+                jobs[result_path] = upper_index
+            match_jobs = [
+                MatchJob(
+                    blue=self.ladder.bots[upper_index + 1],
+                    orange=self.ladder.bots[upper_index],
+                    match_config=make_match_config(self.bundle_map[self.ladder.bots[upper_index + 1]],
+                                                   self.bundle_map[self.ladder.bots[upper_index]], self.team_size),
+                    result_path=result_path,
+                    team_size=self.team_size,
+                )
+                for result_path, upper_index in jobs.items()
+            ]
+
+            failed = set()
+            for job, match_result, usage in self.scheduler.run(match_jobs):
+                upper_index = jobs[job.result_path]
+                if match_result is None:
+                    # Decide by the games played so far, or keep the current order
+                    failed.add(upper_index)
+                    continue
+                played = True
+                self.store_result(job.result_path, match_result, usage)
+                series_results[upper_index].append(match_result)
+                # Leave some time to display the result, like in the classic bubble sort
+                sleep(12)
+
+            undecided = [upper_index for upper_index in undecided if upper_index not in failed and
+                         not self.is_series_decided(self.ladder.bots[upper_index + 1], series_results[upper_index])]
+
+        # Update the ladder all at once, so it never shows a phase that is half done
+        swapped = False
+        for upper_index in upper_indices:
+            above, below = self.ladder.bots[upper_index], self.ladder.bots[upper_index + 1]
+            winner = inferred_winners.get(upper_index) or get_series_winner(above, below, series_results[upper_index])
+            if winner is not None:
+                self.check_prediction(winner, below if winner == above else above)
+            if winner == below:
+                self.ladder.swap(upper_index, upper_index + 1)
+                swapped = True
+        self.ladder.write(self.working_dir.ladder)
+        self.ladder_history.record(self.ladder)
 
-            self._on_match_complete(match_result)
-            sleep(12)
-            return SortStepOutcome(upper_index=upper_index, sort_complete=False)
+        self.write_overlay(upper_indices[0], False, sort_indices=upper_indices)
+        return swapped, played
 
 
-def run_bubble_sort(working_dir: WorkingDir, team_size: int, replay_preference: ReplayPreference):
+def run_bubble_sort(working_dir: WorkingDir, team_size: int, replay_preference: ReplayPreference,
+                    reuse_bot_processes: bool=False, mercy_rule: MercyRule=None, series_policy: SeriesPolicy=None,
+                    stall_timeout: float=60, time_limit: float=30 * 60, budget: ResourceBudget=None,
+                    sample_resources: bool=False, pacing_policy: PacingPolicy=None, odd_even: bool=False,
+                    prediction_policy: PredictionPolicy=None):
+    """
+    Sorts the ladder by comparing adjacent bots until no more swaps are needed. In the classic bubble sort, each
+    comparison depends on the one before it. With odd_even, the sort is done in phases of independent comparisons.
+    """
 
     # Ladder is a list of name.lower()
     ladder = Ladder.read(working_dir.ladder)
-
-    sorter = BubbleSorter(ladder, working_dir, team_size, replay_preference)
-    sorter.begin()
+    budget = budget or ResourceBudget()
+
+    # The bot that bubbles up plays the next comparison in the same slot, so its process can be kept
+    with MatchRunner(reuse_bot_processes, mercy_rule, stall_timeout, time_limit,
+                     recovery_log=working_dir.match_recoveries, cores=budget.cores,
+                     pacing_policy=pacing_policy, sample_resources=sample_resources) as match_runner:
+        scheduler = MatchScheduler(match_runner, replay_preference)
+        sorter = BubbleSorter(ladder, working_dir, team_size, replay_preference, match_runner, series_policy,
+                              sample_resources, scheduler, prediction_policy)
+        if odd_even:
+            sorter.begin_odd_even()
+        else:
+            sorter.begin()
     print('Bubble sort is complete!')
     time.sleep(10)  # Leave some time to display the overlay.
@@ -1,27 +1,45 @@
 import json
 from os.path import relpath
 from pathlib import Path
-from typing import List
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from autoleagueplay.logo_cache import LogoSheet
 
 
 class BubbleSortOverlayData:
     def __init__(self, ladder: List[str], versioned_map, sort_index: int, needs_match: bool, root_dir, winner: str=None,
-                 sort_complete: bool=False):
+                 sort_complete: bool=False, sort_indices: Optional[List[int]]=None,
+                 logo_sheet: Optional['LogoSheet']=None):
         self.ladder = ladder
         self.bot_map = {}
 
         for bot in self.ladder:
-            raw_logo = versioned_map[bot].bot_config.get_logo_file()
             logo = None
-            if raw_logo is not None:
-                logo = relpath(versioned_map[bot].bot_config.get_logo_file(), root_dir)
+            sprite = None
+            if logo_sheet is not None:
+                # The normalized logo, which is small and always the same size
+                if bot in logo_sheet.logos:
+                    logo = relpath(logo_sheet.logos[bot], root_dir)
+                    sprite = logo_sheet.sprites[bot]
+            else:
+                raw_logo = versioned_map[bot].bot_config.get_logo_file()
+                if raw_logo is not None:
+                    logo = relpath(raw_logo, root_dir)
             self.bot_map[bot] = {
                 'name': versioned_map[bot].bot_config.name,
                 'logo': logo,
+                'sprite': sprite,
                 'updated_date': versioned_map[bot].updated_date.timestamp(),
             }
 
+        self.sprite_sheet = None
+        if logo_sheet is not None and logo_sheet.sprite_sheet is not None:
+            self.sprite_sheet = relpath(logo_sheet.sprite_sheet, root_dir)
+
         self.sort_index = sort_index
+        # The upper index of every pair compared in the same phase of an odd-even sort
+        self.sort_indices = sort_indices if sort_indices is not None else [sort_index]
         self.needs_match = needs_match
         self.winner = winner
         self.sort_complete = sort_complete
@@ -0,0 +1,100 @@
+import csv
+import gzip
+import io
+from pathlib import Path
+from typing import List, Set
+
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.result_history import StoredResult, get_result_versions, iter_result_paths, read_stored_result
+
+EXPORT_COLUMNS = [
+    'result_file', 'division', 'timestamp', 'replay_id',
+    'blue', 'orange', 'blue_version', 'orange_version', 'winner',
+    'blue_goals', 'orange_goals', 'blue_shots', 'orange_shots',
+    'blue_saves', 'orange_saves', 'blue_points', 'orange_points', 'shortened',
+]
+
+# Number of results written to the export at a time. Bounds the memory used regardless of the size of the history
+CHUNK_SIZE = 1000
+
+
+def get_exported_index_path(export_path: Path) -> Path:
+    return export_path.parent / f'{export_path.name}.exported'
+
+
+def read_exported_names(export_path: Path) -> Set[str]:
+    """
+    Returns the names of the result files that are already in the export.
+    """
+    index_path = get_exported_index_path(export_path)
+    if not index_path.exists():
+        return set()
+    with open(index_path, 'r') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def make_row(stored: StoredResult) -> list:
+    result = stored.result
+    blue_version, orange_version = get_result_versions(stored.path.name, result.blue, result.orange)
+    # Old results do not know when they were played, so the time the file was written is the best guess
+    timestamp = result.timestamp if result.timestamp is not None else stored.path.stat().st_mtime
+    return [
+        stored.path.name, stored.division, timestamp, result.replay_id,
+        result.blue, result.orange, blue_version, orange_version, result.winner,
+        result.blue_goals, result.orange_goals, result.blue_shots, result.orange_shots,
+        result.blue_saves, result.orange_saves, result.blue_points, result.orange_points, result.shortened,
+    ]
+
+
+def write_chunk(export_path: Path, rows: List[list], names: List[str], include_header: bool):
+    # Each chunk is appended as a separate gzip member. Concatenated members are read back as a single file by gzip
+    # readers, including pandas.read_csv.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if include_header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(rows)
+    with gzip.open(export_path, 'at', newline='') as f:
+        f.write(buffer.getvalue())
+
+    # Only record the results as exported once they are safely written
+    with open(get_exported_index_path(export_path), 'a') as f:
+        f.writelines(f'{name}\n' for name in names)
+
+
+def export_results(working_dir: WorkingDir, export_path: Path=None) -> int:
+    """
+    Appends every match result that isn't exported yet to a gzip compressed CSV file with one row per match.
+    Returns the number of newly exported results. Raises FileExistsError if the export path is a file that wasn't made
+    by an export, since it is not known what is in it.
+    """
+    export_path = export_path or working_dir.results_export
+    index_path = get_exported_index_path(export_path)
+    if export_path.exists() and not index_path.exists():
+        raise FileExistsError(f'\'{export_path}\' already exists, but it has no {index_path.name} next to it, so it '
+                              f'was not made by an export. Move it or export to another file.')
+    if index_path.exists() and not export_path.exists():
+        # The export was removed, so start over
+        index_path.unlink()
+    exported_names = read_exported_names(export_path)
+    needs_header = not export_path.exists()
+
+    rows = []
+    names = []
+    count = 0
+    for path in iter_result_paths(working_dir):
+        if path.name in exported_names:
+            continue
+        rows.append(make_row(read_stored_result(path)))
+        names.append(path.name)
+        if len(rows) >= CHUNK_SIZE:
+            write_chunk(export_path, rows, names, needs_header)
+            needs_header = False
+            count += len(rows)
+            rows, names = [], []
+
+    if rows or needs_header:
+        write_chunk(export_path, rows, names, needs_header)
+        count += len(rows)
+
+    return count
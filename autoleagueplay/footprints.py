@@ -0,0 +1,147 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+import psutil
+
+from autoleagueplay.resource_usage import BotResourceUsage
+
+if TYPE_CHECKING:
+    from rlbot.setup_manager import SetupManager
+
+def pin_process(process: psutil.Process, cores: List[int]):
+    """
+    Restricts the process to the given cores. Not every platform supports this, in which case nothing happens.
+    """
+    try:
+        if sorted(process.cpu_affinity()) != cores:
+            process.cpu_affinity(cores)
+    except (AttributeError, psutil.Error):
+        pass
+
+
+class BotProcessMonitor:
+    """
+    Watches the bot processes of a match in a background thread. At every interval it finds the processes of each
+    player, pins them to the given cores and samples their CPU time, memory and number of threads. RLBot pins the teams
+    to different cores when the bots start, so the cores are split between the teams in the same way.
+    """
+
+    def __init__(self, setup_manager: 'SetupManager', cores: Optional[List[int]]=None, interval: float=1.0):
+        self.setup_manager = setup_manager
+        self.cores = sorted(cores) if cores else None
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_time = None
+        # Per player index
+        self._bot_names: Dict[int, str] = {}
+        self._first_cpu_times: Dict[int, Dict[int, float]] = {}
+        self._last_cpu_times: Dict[int, Dict[int, float]] = {}
+        self._first_memory: Dict[int, float] = {}
+        self._last_memory: Dict[int, float] = {}
+        self._peak_memory: Dict[int, float] = {}
+        self._peak_threads: Dict[int, int] = {}
+        self._samples: Dict[int, int] = {}
+
+    def __enter__(self) -> 'BotProcessMonitor':
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def get_team_cores(self, team: int) -> Optional[List[int]]:
+        if self.cores is None or len(self.cores) < 2:
+            return self.cores
+        half = len(self.cores) // 2
+        return self.cores[:half] if team == 0 else self.cores[half:]
+
+    def get_player_processes(self, index: int) -> List[psutil.Process]:
+        pids = set()
+        process_info = self.setup_manager.bot_processes.get(index)
+        if process_info is not None:
+            pids.add((process_info.process or process_info.subprocess).pid)
+        metadata = self.setup_manager.agent_metadata_map.get(index)
+        if metadata is not None:
+            pids.update(metadata.pids)
+
+        processes = []
+        for pid in pids:
+            try:
+                process = psutil.Process(pid)
+                processes.append(process)
+                processes.extend(process.children(recursive=True))
+            except psutil.Error:
+                pass
+        return processes
+
+    def sample(self):
+        for index, process_info in list(self.setup_manager.bot_processes.items()):
+            player_config = process_info.player_config
+            self._bot_names[index] = player_config.name
+            team_cores = self.get_team_cores(player_config.team)
+
+            memory = 0
+            threads = 0
+            for process in self.get_player_processes(index):
+                try:
+                    # Reads all the numbers of the process at once, which is much cheaper on most platforms
+                    with process.oneshot():
+                        if team_cores is not None:
+                            pin_process(process, team_cores)
+                        cpu_times = process.cpu_times()
+                        memory += process.memory_info().rss
+                        threads += process.num_threads()
+                except psutil.Error:
+                    continue
+                cpu_time = cpu_times.user + cpu_times.system
+                # A reused process has already spent CPU time before this match, so only the difference counts
+                self._first_cpu_times.setdefault(index, {}).setdefault(process.pid, cpu_time)
+                self._last_cpu_times.setdefault(index, {})[process.pid] = cpu_time
+
+            memory_mb = memory / 2 ** 20
+            self._first_memory.setdefault(index, memory_mb)
+            self._last_memory[index] = memory_mb
+            self._peak_memory[index] = max(self._peak_memory.get(index, 0), memory_mb)
+            self._peak_threads[index] = max(self._peak_threads.get(index, 0), threads)
+            self._samples[index] = self._samples.get(index, 0) + 1
+
+    def get_usage(self) -> Dict[str, BotResourceUsage]:
+        """
+        Returns the resource usage of each bot in the match by the bot's name.
+        """
+        elapsed = time.perf_counter() - self._start_time
+        per_bot: Dict[str, List[BotResourceUsage]] = {}
+        for index, name in self._bot_names.items():
+            first, last = self._first_cpu_times.get(index, {}), self._last_cpu_times.get(index, {})
+            cpu_seconds = sum(last[pid] - first[pid] for pid in last)
+            per_bot.setdefault(name, []).append(BotResourceUsage(
+                cpu_seconds=cpu_seconds,
+                cores=cpu_seconds / elapsed,
+                peak_rss_mb=self._peak_memory[index],
+                rss_growth_mb=self._last_memory[index] - self._first_memory[index],
+                peak_threads=self._peak_threads[index],
+                samples=self._samples[index],
+            ))
+
+        return {
+            name: BotResourceUsage(
+                cpu_seconds=sum(player.cpu_seconds for player in players),
+                cores=sum(player.cores for player in players) / len(players),
+                peak_rss_mb=max(player.peak_rss_mb for player in players),
+                rss_growth_mb=max(player.rss_growth_mb for player in players),
+                peak_threads=max(player.peak_threads for player in players),
+                samples=max(player.samples for player in players),
+            )
+            for name, players in per_bot.items()
+        }
@@ -0,0 +1,143 @@
+import math
+from dataclasses import dataclass
+
+from autoleagueplay.match_result import MatchResult
+
+
+class StreamingHistogram:
+    """
+    Counts values in buckets that grow exponentially in size, so the memory used is the same no matter how many values
+    are added, and percentiles are accurate to within about 5 percent of the value. Values are typically in
+    milliseconds.
+    """
+
+    BUCKETS_PER_DOUBLING = 8
+    MIN_VALUE = 0.1
+    # Covers 0.1 ms up to more than 100 seconds
+    BUCKET_COUNT = 21 * BUCKETS_PER_DOUBLING
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKET_COUNT
+        self.count = 0
+        self.max = 0.0
+
+    def bucket_of(self, value: float) -> int:
+        if value <= self.MIN_VALUE:
+            return 0
+        bucket = int(math.log2(value / self.MIN_VALUE) * self.BUCKETS_PER_DOUBLING) + 1
+        return min(bucket, self.BUCKET_COUNT - 1)
+
+    def bucket_middle(self, bucket: int) -> float:
+        if bucket == 0:
+            return self.MIN_VALUE
+        return self.MIN_VALUE * 2 ** ((bucket - 0.5) / self.BUCKETS_PER_DOUBLING)
+
+    def add(self, value: float):
+        self.counts[self.bucket_of(value)] += 1
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Returns the given percentile, which is never more than the largest value. Returns 0 if no values were added.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.bucket_middle(bucket), self.max)
+        return self.max
+
+
+# The game clock must fall behind the real time by this much between two frames for it to count as a stall. The grader
+# polls the game on its own timer, so the time between the frames it sees varies by a few milliseconds on a healthy host
+STALL_THRESHOLD_MS = 100
+
+
+@dataclass
+class FramePacing:
+    """
+    How smoothly the game ran during a match. Tick intervals are the real time between new game frames seen by the
+    grader, and game gaps are the game time between them. The game is stalled when its clock falls behind the real
+    time by more than STALL_THRESHOLD_MS between two frames, e.g. because the game froze or the host was overloaded,
+    and stalled_seconds is the real time lost that way out of the active_seconds the round was active.
+    """
+
+    frames: int
+    active_seconds: float
+    stalled_seconds: float
+    tick_interval_p50_ms: float
+    tick_interval_p99_ms: float
+    tick_interval_max_ms: float
+    game_gap_p50_ms: float
+    game_gap_p99_ms: float
+    game_gap_max_ms: float
+
+    def stalled_ratio(self) -> float:
+        return self.stalled_seconds / self.active_seconds if self.active_seconds > 0 else 0.0
+
+
+class FramePacingMonitor:
+    """
+    Follows the packets of a match and measures the frame pacing of the game while the round is active.
+    """
+
+    def __init__(self):
+        self.tick_intervals = StreamingHistogram()
+        self.game_gaps = StreamingHistogram()
+        self.frames = 0
+        self.active_seconds = 0.0
+        self.stalled_seconds = 0.0
+        self.last_frame_num = None
+        self.last_seconds_elapsed = None
+        self.last_tick_time = None
+
+    def on_packet(self, frame_num: int, seconds_elapsed: float, now: float, measuring: bool):
+        if frame_num == self.last_frame_num:
+            return
+        if measuring and self.last_frame_num is not None:
+            tick_interval = now - self.last_tick_time
+            game_gap = seconds_elapsed - self.last_seconds_elapsed
+            self.frames += 1
+            self.active_seconds += tick_interval
+            # Frames the grader missed between its polls are not a problem as long as the game clock kept up
+            if (tick_interval - game_gap) * 1000 > STALL_THRESHOLD_MS:
+                self.stalled_seconds += tick_interval - game_gap
+            self.tick_intervals.add(tick_interval * 1000)
+            self.game_gaps.add(game_gap * 1000)
+        self.last_frame_num = frame_num
+        self.last_seconds_elapsed = seconds_elapsed
+        self.last_tick_time = now
+
+    def get_summary(self) -> FramePacing:
+        return FramePacing(
+            frames=self.frames,
+            active_seconds=round(self.active_seconds, 2),
+            stalled_seconds=round(self.stalled_seconds, 2),
+            tick_interval_p50_ms=round(self.tick_intervals.percentile(50), 2),
+            tick_interval_p99_ms=round(self.tick_intervals.percentile(99), 2),
+            tick_interval_max_ms=round(self.tick_intervals.max, 2),
+            game_gap_p50_ms=round(self.game_gaps.percentile(50), 2),
+            game_gap_p99_ms=round(self.game_gaps.percentile(99), 2),
+            game_gap_max_ms=round(self.game_gaps.max, 2),
+        )
+
+
+@dataclass
+class PacingPolicy:
+    """
+    Decides which matches had too poor frame pacing to be trusted, based on how much of the match the game clock was
+    stalled. Poor matches are flagged in their result, and are played again if replay_poor_matches is set.
+    """
+
+    max_stalled_ratio: float = 0.05
+    replay_poor_matches: bool = False
+
+    def is_poor(self, result: MatchResult) -> bool:
+        # Results from before stalls were measured can't be judged
+        if result.frame_pacing is None or 'stalled_seconds' not in result.frame_pacing:
+            return False
+        return FramePacing(**result.frame_pacing).stalled_ratio() > self.max_stalled_ratio
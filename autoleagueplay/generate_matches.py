@@ -1,5 +1,5 @@
 import random
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from autoleagueplay.ladder import Ladder
 
@@ -22,6 +22,27 @@ def generate_round_robin_matches(bots: List[str]) -> List[Tuple[str, str]]:
     return matches
 
 
+def order_for_bot_reuse(matches: List[Tuple[str, str]], previous: Optional[Tuple[str, str]]=None) -> List[Tuple[str, str]]:
+    """
+    Returns the matches in an order where bots often play in the same slot (blue or orange) as in the match before,
+    which allows their processes to be kept between matches. The order is greedy and deterministic.
+    :param previous: the match played right before these matches, if any.
+    """
+    def shared_slots(match: Tuple[str, str]) -> int:
+        if previous is None:
+            return 0
+        return int(match[0] == previous[0]) + int(match[1] == previous[1])
+
+    remaining = list(matches)
+    ordered = []
+    while remaining:
+        # Ties are won by the earliest match, so the original order is kept when no bots can be reused
+        best_index = max(range(len(remaining)), key=lambda i: (shared_slots(remaining[i]), -i))
+        previous = remaining.pop(best_index)
+        ordered.append(previous)
+    return ordered
+
+
 def get_playing_division_indices(ladder: Ladder, odd_week: bool) -> List[int]:
     # Result is a list containing either even or odd indices.
     # If there is only one division always play that division (division 0, quantum).
@@ -0,0 +1,123 @@
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.result_history import iter_stored_results
+
+
+@dataclass
+class PredictionPolicy:
+    """
+    Decides when a comparison in a bubble sort is settled by the head-to-head history instead of being played. A
+    comparison is skipped when one bot is predicted to be the better bot with at least the given confidence. A random
+    check_rate of the skipped comparisons are played anyway, to find out whether the predictions can be trusted.
+    """
+
+    confidence: float = 0.99
+    check_rate: float = 0.1
+
+
+def probability_better(wins: int, losses: int) -> float:
+    """
+    Returns the probability that a bot wins more than half of its games against an opponent, given how often it won
+    and lost against it so far. It starts from a uniform prior on the win rate, so the posterior is Beta(wins + 1,
+    losses + 1), and the probability that it is above one half is a binomial tail that can be computed exactly.
+    """
+    n = wins + losses + 1
+    tail = 0
+    coefficient = 1  # n choose k
+    for k in range(wins + 1):
+        tail += coefficient
+        coefficient = coefficient * (n - k) // (k + 1)
+    return tail / 2 ** n
+
+
+class HeadToHeadModel:
+    """
+    The number of times each bot beat each other bot, over all results in the working directory. Results of every
+    version of a bot count, since results are stored under the unversioned name. Games without a winner are ignored.
+    """
+
+    def __init__(self):
+        self.wins: Dict[Tuple[str, str], int] = {}
+
+    @staticmethod
+    def from_results(working_dir: WorkingDir) -> 'HeadToHeadModel':
+        model = HeadToHeadModel()
+        for stored in iter_stored_results(working_dir):
+            model.add(stored.result)
+        return model
+
+    def add(self, result: MatchResult):
+        goal_diff = result.blue_goals - result.orange_goals
+        if goal_diff == 0:
+            return
+        blue, orange = result.blue.lower(), result.orange.lower()
+        winner, loser = (blue, orange) if goal_diff > 0 else (orange, blue)
+        self.wins[(winner, loser)] = self.wins.get((winner, loser), 0) + 1
+
+    def get_record(self, bot: str, opponent: str) -> Tuple[int, int]:
+        """
+        Returns the number of games the bot won and lost against the opponent.
+        """
+        return self.wins.get((bot, opponent), 0), self.wins.get((opponent, bot), 0)
+
+    def win_probability(self, bot: str, opponent: str) -> float:
+        """
+        Returns the probability that the bot is better than the opponent.
+        """
+        return probability_better(*self.get_record(bot, opponent))
+
+
+@dataclass
+class InferredDecision:
+    """
+    A comparison in a bubble sort that was settled by the head-to-head model. If it was picked to be checked, the
+    comparison was played anyway, and actual is the winner of the played series.
+    """
+
+    upper_version: str
+    lower_version: str
+    predicted: str
+    probability: float
+    wins: int
+    losses: int
+    checked: bool = False
+    actual: Optional[str] = None
+    timestamp: float = None
+
+    def get_key(self) -> Tuple[str, str]:
+        return tuple(sorted((self.upper_version, self.lower_version)))
+
+
+class InferredDecisionLog:
+    """
+    Appends every inferred decision to a JSON lines file. The inferred decisions are kept apart from the match results,
+    so standings and exports only ever count matches that were played. Decisions that were not checked are reused
+    when the same versions are compared again.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.decisions: Dict[Tuple[str, str], InferredDecision] = {}
+        if path.exists():
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        decision = InferredDecision(**json.loads(line))
+                        if not decision.checked:
+                            self.decisions[decision.get_key()] = decision
+
+    def get(self, version_1: str, version_2: str) -> Optional[InferredDecision]:
+        return self.decisions.get(tuple(sorted((version_1, version_2))))
+
+    def record(self, decision: InferredDecision):
+        decision.timestamp = time.time()
+        if not decision.checked:
+            self.decisions[decision.get_key()] = decision
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(decision.__dict__) + '\n')
@@ -1,7 +1,7 @@
 import json
 import math
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
 
 class Ladder:
@@ -13,6 +13,31 @@ class Ladder:
         self.division_size = division_size
         self.overlap_size = overlap_size
         self.round_robin_size = division_size + overlap_size
+        self._rank_index: Dict[str, int] = {}
+
+    def rank_of(self, bot: str) -> int:
+        """
+        Returns the index of the bot in the ladder in O(1). Raises a ValueError if the bot is not on the ladder.
+        The index is rebuilt when it turns out to be outdated, so the bots list can still be changed directly.
+        """
+        rank = self._rank_index.get(bot)
+        if rank is None or rank >= len(self.bots) or self.bots[rank] != bot:
+            self._rank_index = {name: index for index, name in enumerate(self.bots)}
+            rank = self._rank_index.get(bot)
+            if rank is None:
+                raise ValueError(f'{bot} is not on the ladder')
+        return rank
+
+    def swap(self, index_1: int, index_2: int):
+        """
+        Swaps the bots at the given indices and keeps the rank index up to date.
+        """
+        bot_1 = self.bots[index_1]
+        bot_2 = self.bots[index_2]
+        self.bots[index_1] = bot_2
+        self.bots[index_2] = bot_1
+        self._rank_index[bot_2] = index_1
+        self._rank_index[bot_1] = index_2
 
     def division(self, division_index: int) -> List[str]:
         """
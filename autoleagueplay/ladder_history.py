@@ -0,0 +1,181 @@
+import bisect
+import json
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from autoleagueplay.ladder import Ladder
+from autoleagueplay.paths import WorkingDir
+
+# How often the full ladder is stored instead of the changes. Looking up an old ladder never has to apply more than
+# this many entries of changes
+KEYFRAME_INTERVAL = 50
+
+
+def compute_changes(old_bots: List[str], new_bots: List[str]) -> List[list]:
+    """
+    Returns a list of changes that turns the old ladder into the new ladder. The changes are
+    ['remove', index], ['insert', index, bot], and ['swap', index_1, index_2], and must be applied in order.
+    """
+    current = list(old_bots)
+    changes = []
+
+    new_bot_set = set(new_bots)
+    for index in range(len(current) - 1, -1, -1):
+        if current[index] not in new_bot_set:
+            changes.append(['remove', index])
+            del current[index]
+
+    current_bot_set = set(current)
+    for bot in new_bots:
+        if bot not in current_bot_set:
+            changes.append(['insert', len(current), bot])
+            current.append(bot)
+
+    positions = {bot: index for index, bot in enumerate(current)}
+    for index, bot in enumerate(new_bots):
+        if current[index] != bot:
+            other_index = positions[bot]
+            changes.append(['swap', index, other_index])
+            current[other_index] = current[index]
+            current[index] = bot
+            positions[current[other_index]] = other_index
+            positions[bot] = index
+
+    return changes
+
+
+def apply_changes(bots: List[str], changes: List[list]):
+    """
+    Applies changes made by compute_changes to the list of bots in place.
+    """
+    for change in changes:
+        if change[0] == 'remove':
+            del bots[change[1]]
+        elif change[0] == 'insert':
+            bots.insert(change[1], change[2])
+        elif change[0] == 'swap':
+            bots[change[1]], bots[change[2]] = bots[change[2]], bots[change[1]]
+        else:
+            raise ValueError(f'Unknown ladder change {change}')
+
+
+class LadderHistory:
+    """
+    Every state the ladder has been in, stored in a file with one JSON entry per line. Most entries only contain the
+    changes since the previous entry, e.g. the single swap after a bubble sort comparison. The history is read once
+    and can then answer questions about any point in time.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._entries = None
+        self._times = []
+        self._latest_bots = None
+        self._entries_since_keyframe = 0
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = []
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        self._add_entry(json.loads(line))
+
+    def _add_entry(self, entry: dict):
+        if 'bots' in entry:
+            self._latest_bots = list(entry['bots'])
+            self._entries_since_keyframe = 0
+        else:
+            apply_changes(self._latest_bots, entry['changes'])
+            self._entries_since_keyframe += 1
+        self._entries.append(entry)
+        self._times.append(entry['time'])
+
+    def record(self, ladder: Ladder, timestamp: float=None, label: str=None) -> bool:
+        """
+        Adds the ladder to the history, unless it is the same as the latest entry and no label is given.
+        Returns True if an entry was added.
+        """
+        self._load()
+        entry = {'time': timestamp if timestamp is not None else time.time()}
+        if label is not None:
+            entry['label'] = label
+
+        if self._latest_bots is None or self._entries_since_keyframe >= KEYFRAME_INTERVAL - 1:
+            entry['bots'] = list(ladder.bots)
+        else:
+            entry['changes'] = compute_changes(self._latest_bots, ladder.bots)
+            if len(entry['changes']) == 0 and label is None:
+                return False
+
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._add_entry(entry)
+        return True
+
+    def ladder_at(self, timestamp: float) -> Optional[Ladder]:
+        """
+        Returns the ladder as it was at the given time, or None if the history does not go back that far.
+        """
+        self._load()
+        last_index = bisect.bisect_right(self._times, timestamp) - 1
+        if last_index < 0:
+            return None
+        keyframe_index = last_index
+        while 'bots' not in self._entries[keyframe_index]:
+            keyframe_index -= 1
+        bots = list(self._entries[keyframe_index]['bots'])
+        for entry in self._entries[keyframe_index + 1:last_index + 1]:
+            apply_changes(bots, entry['changes'])
+        return Ladder(bots)
+
+    def rank_at(self, bot: str, timestamp: float) -> Optional[int]:
+        """
+        Returns the index of the bot on the ladder at the given time, or None if it wasn't on the ladder.
+        """
+        ladder = self.ladder_at(timestamp)
+        if ladder is None:
+            return None
+        try:
+            return ladder.rank_of(bot)
+        except ValueError:
+            return None
+
+    def movement(self, since: float, until: float) -> Dict[str, Optional[int]]:
+        """
+        Returns how many places each bot on the ladder at time `until` has moved up since time `since`. Bots that were
+        not on the ladder at time `since` map to None.
+        """
+        old_ladder = self.ladder_at(since) or Ladder([])
+        new_ladder = self.ladder_at(until) or Ladder([])
+        old_ranks = {bot: index for index, bot in enumerate(old_ladder.bots)}
+        return {
+            bot: old_ranks[bot] - index if bot in old_ranks else None
+            for index, bot in enumerate(new_ladder.bots)
+        }
+
+
+def print_ladder_history(working_dir: WorkingDir, at: datetime=None, since: datetime=None):
+    """
+    Prints the ladder as it was at the given time and how much each bot has moved since another time. By default, the
+    current ladder is compared to the ladder a week earlier.
+    """
+    at = at or datetime.now()
+    since = since or at - timedelta(days=7)
+
+    history = LadderHistory(working_dir.ladder_history)
+    ladder = history.ladder_at(at.timestamp())
+    if ladder is None:
+        print(f'The ladder history does not go back to {at}')
+        return
+    movement = history.movement(since.timestamp(), at.timestamp())
+
+    print(f'Ladder at {at:%Y-%m-%d %H:%M} compared to {since:%Y-%m-%d %H:%M}:')
+    for index, bot in enumerate(ladder.bots):
+        moved = movement[bot]
+        moved_str = 'new' if moved is None else f'{moved:+d}' if moved != 0 else '='
+        print(f'{index + 1:>3}  {bot:<32}{moved_str:>5}')
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import math
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from autoleagueplay.versioned_bot import VersionedBot
+
+# The width and height of every normalized logo, and of each sprite in the sprite sheet
+LOGO_SIZE = 128
+
+
+@dataclass
+class LogoSheet:
+    """
+    The normalized logos of the bots on a ladder by bot name, and a sprite sheet with all of them. sprites has the
+    position of each bot's logo in the sprite sheet. Bots without a logo are left out.
+    """
+
+    logos: Dict[str, Path]
+    sprite_sheet: Optional[Path]
+    sprites: Dict[str, Tuple[int, int]]
+
+
+def normalize_logo(data: bytes, path: Path):
+    """
+    Scales the logo to fit in a square of LOGO_SIZE, centers it on a transparent background and saves it as a PNG.
+    """
+    logo = Image.open(BytesIO(data)).convert('RGBA')
+    scale = LOGO_SIZE / max(logo.width, logo.height)
+    logo = logo.resize((max(1, round(logo.width * scale)), max(1, round(logo.height * scale))), Image.LANCZOS)
+    normalized = Image.new('RGBA', (LOGO_SIZE, LOGO_SIZE))
+    normalized.paste(logo, ((LOGO_SIZE - logo.width) // 2, (LOGO_SIZE - logo.height) // 2))
+    save_png(normalized, path)
+
+
+def save_png(image: Image.Image, path: Path):
+    # Written next to the final file first, so an interrupted run never leaves a broken image in the cache
+    temp_path = path.with_name(path.name + '.tmp')
+    image.save(temp_path, format='PNG', optimize=True)
+    temp_path.replace(path)
+
+
+class LogoCache:
+    """
+    Normalizes the logos of bots for the overlay. Logos come in any size and format, so each is scaled once to a small
+    PNG of a fixed size, stored under the hash of the original file. The index maps each versioned bot key to the hash
+    of its logo, so the original logo of a version is only read the first time it is seen. Sprite sheets are also
+    stored under a hash of the logos they contain, and are only made when the set of logos changes.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.index_path = directory / 'index.json'
+        self.index: Dict[str, Optional[str]] = {}
+        if self.index_path.exists():
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+
+    def get_logo_path(self, content_hash: str) -> Path:
+        return self.directory / f'{content_hash}.png'
+
+    def get_logo_hash(self, versioned_bot: VersionedBot) -> Optional[str]:
+        """
+        Returns the hash of the bot's logo, normalizing the logo first if it is not in the cache. Returns None if the
+        bot has no logo or it can't be read.
+        """
+        key = versioned_bot.get_key()
+        if key in self.index and (self.index[key] is None or self.get_logo_path(self.index[key]).exists()):
+            return self.index[key]
+
+        content_hash = None
+        raw_logo = versioned_bot.bot_config.get_logo_file()
+        if raw_logo is not None:
+            try:
+                data = Path(raw_logo).read_bytes()
+                content_hash = hashlib.sha256(data).hexdigest()[:16]
+                if not self.get_logo_path(content_hash).exists():
+                    normalize_logo(data, self.get_logo_path(content_hash))
+            except OSError as e:
+                print(f'Could not read the logo of {key}: {e}')
+                content_hash = None
+        self.index[key] = content_hash
+        return content_hash
+
+    def get_sprite_sheet(self, content_hashes: List[str]) -> Tuple[Path, Dict[str, Tuple[int, int]]]:
+        """
+        Returns the sprite sheet with the given logos in a square grid, and the position of each logo by its hash.
+        An index of the positions is stored next to the sprite sheet.
+        """
+        content_hashes = sorted(set(content_hashes))
+        sheet_hash = hashlib.sha256('\n'.join(content_hashes).encode()).hexdigest()[:16]
+        sheet_path = self.directory / f'sprites_{sheet_hash}.png'
+
+        columns = max(1, math.ceil(math.sqrt(len(content_hashes))))
+        positions = {
+            content_hash: ((i % columns) * LOGO_SIZE, (i // columns) * LOGO_SIZE)
+            for i, content_hash in enumerate(content_hashes)
+        }
+        if not sheet_path.exists():
+            rows = max(1, math.ceil(len(content_hashes) / columns))
+            sheet = Image.new('RGBA', (columns * LOGO_SIZE, rows * LOGO_SIZE))
+            for content_hash, position in positions.items():
+                with Image.open(self.get_logo_path(content_hash)) as logo:
+                    sheet.paste(logo, position)
+            save_png(sheet, sheet_path)
+            with open(sheet_path.with_suffix('.json'), 'w') as f:
+                json.dump({content_hash: [x, y, LOGO_SIZE, LOGO_SIZE] for content_hash, (x, y) in positions.items()},
+                          f, indent=4, sort_keys=True)
+        return sheet_path, positions
+
+    def build(self, versioned_bots: Dict[str, VersionedBot]) -> LogoSheet:
+        """
+        Returns the normalized logos and the sprite sheet of the given bots, by bot name.
+        """
+        self.directory.mkdir(exist_ok=True)
+        logo_hashes = {bot: self.get_logo_hash(versioned_bot) for bot, versioned_bot in versioned_bots.items()}
+        logo_hashes = {bot: content_hash for bot, content_hash in logo_hashes.items() if content_hash is not None}
+        with open(self.index_path, 'w') as f:
+            json.dump(self.index, f, indent=4, sort_keys=True)
+
+        if not logo_hashes:
+            return LogoSheet({}, None, {})
+        sheet_path, positions = self.get_sprite_sheet(list(logo_hashes.values()))
+        return LogoSheet(
+            logos={bot: self.get_logo_path(content_hash) for bot, content_hash in logo_hashes.items()},
+            sprite_sheet=sheet_path,
+            sprites={bot: positions[content_hash] for bot, content_hash in logo_hashes.items()},
+        )
@@ -1,14 +1,17 @@
+import time
 from dataclasses import dataclass, field
 from typing import Optional
 
 from rlbot.training.training import Grade, Pass, Fail
-from rlbot.utils.game_state_util import GameState
+from rlbot.utils.game_state_util import GameState, GameInfoState
+from rlbot.utils.structures.game_interface import GameInterface
 from rlbot.utils.structures.game_data_struct import GameTickPacket
 from rlbottraining.grading.grader import Grader
 from rlbottraining.grading.training_tick_packet import TrainingTickPacket
 from rlbottraining.rng import SeededRandomNumberGenerator
 from rlbottraining.training_exercise import TrainingExercise
 
+from autoleagueplay.frame_pacing import FramePacingMonitor
 from autoleagueplay.match_result import MatchResult
 from autoleagueplay.replays import ReplayMonitor, ReplayPreference
 
@@ -18,22 +21,79 @@ class FailDueToNoReplay(Fail):
         return 'FAIL: Match finished but no replay was written to disk.'
 
 
+class FailDueToStall(Fail):
+    def __init__(self, stalled_seconds: float):
+        self.stalled_seconds = stalled_seconds
+
+    def __repr__(self):
+        return f'FAIL: The game time did not progress for {self.stalled_seconds:.0f} seconds.'
+
+
+class FailDueToTimeLimit(Fail):
+    def __repr__(self):
+        return 'FAIL: The match was not over within the time limit.'
+
+
+@dataclass
+class MercyRule:
+    """
+    Decides when a match is settled long before it ends, such that it can be ended early.
+    """
+
+    # End the match when a team leads by at least this many goals
+    goal_diff: Optional[int] = None
+    # End the match when the trailing team would have to score more goals per minute than this to catch up
+    max_goals_per_minute: Optional[float] = None
+
+    def is_decided(self, packet: GameTickPacket) -> bool:
+        game_info = packet.game_info
+        if game_info.is_overtime or not game_info.is_round_active:
+            return False
+        lead = abs(packet.teams[0].score - packet.teams[1].score)
+        if lead == 0:
+            return False
+        if self.goal_diff is not None and lead >= self.goal_diff:
+            return True
+        if self.max_goals_per_minute is not None and not game_info.is_unlimited_time:
+            catch_up_goals = self.max_goals_per_minute * game_info.game_time_remaining / 60
+            return lead > catch_up_goals
+        return False
+
+
 @dataclass
 class MatchGrader(Grader):
 
     replay_monitor: ReplayMonitor = field(default_factory=ReplayMonitor)
+    mercy_rule: Optional[MercyRule] = None
+    game_interface: Optional[GameInterface] = None  # Needed to end matches early
+    # The match fails if the game time does not progress for this many seconds of real time, e.g. if the game freezes
+    stall_timeout: float = 60
+    # The match fails if it is not over by this real time, in seconds since epoch
+    deadline: Optional[float] = None
 
     last_match_time: float = 0
     last_game_tick_packet: GameTickPacket = None
     match_result: Optional[MatchResult] = None
     saw_active_packets = False
+    ended_early: bool = False
+    last_seconds_elapsed: float = -1
+    last_progress_time: Optional[float] = None  # Real time when the game time last progressed
+    frame_pacing: FramePacingMonitor = field(default_factory=FramePacingMonitor)
 
     def on_tick(self, tick: TrainingTickPacket) -> Optional[Grade]:
         self.replay_monitor.ensure_monitoring()
         self.last_game_tick_packet = tick.game_tick_packet
         game_info = tick.game_tick_packet.game_info
+        self.frame_pacing.on_packet(game_info.frame_num, game_info.seconds_elapsed, time.perf_counter(),
+                                    measuring=game_info.is_round_active and not game_info.is_match_ended)
+        stall = self.check_progress(game_info.seconds_elapsed)
+        if stall is not None:
+            self.replay_monitor.stop_monitoring()
+            return stall
         if game_info.is_match_ended and self.saw_active_packets:
             self.match_result = fetch_match_score(tick.game_tick_packet)
+            self.match_result.shortened = self.ended_early
+            self.match_result.frame_pacing = self.frame_pacing.get_summary().__dict__
             if self.replay_monitor.replay_id or self.replay_monitor.replay_preference == ReplayPreference.IGNORE_REPLAY:
                 self.replay_monitor.stop_monitoring()
                 return Pass()
@@ -45,8 +105,28 @@ class MatchGrader(Grader):
             if game_info.is_round_active and not game_info.is_match_ended:
                 self.saw_active_packets = True
             self.last_match_time = game_info.seconds_elapsed
+            if self.saw_active_packets and self.should_end_early(tick.game_tick_packet):
+                # Ending the match like this still lets the game save the replay
+                print('The match is decided. Ending it early.')
+                self.ended_early = True
+                self.game_interface.set_game_state(GameState(game_info=GameInfoState(end_match=True)))
             return None
 
+    def check_progress(self, seconds_elapsed: float) -> Optional[Grade]:
+        now = time.time()
+        if self.last_progress_time is None or seconds_elapsed != self.last_seconds_elapsed:
+            self.last_seconds_elapsed = seconds_elapsed
+            self.last_progress_time = now
+        elif now - self.last_progress_time > self.stall_timeout:
+            return FailDueToStall(now - self.last_progress_time)
+        if self.deadline is not None and now > self.deadline:
+            return FailDueToTimeLimit()
+        return None
+
+    def should_end_early(self, packet: GameTickPacket) -> bool:
+        return self.mercy_rule is not None and self.game_interface is not None and not self.ended_early \
+               and self.mercy_rule.is_decided(packet)
+
 
 def fetch_match_score(packet: GameTickPacket):
     blue = packet.game_cars[0]
@@ -61,7 +141,8 @@ def fetch_match_score(packet: GameTickPacket):
         blue_saves=blue.score_info.saves,
         orange_saves=orange.score_info.saves,
         blue_points=blue.score_info.score,
-        orange_points=orange.score_info.score
+        orange_points=orange.score_info.score,
+        timestamp=time.time()
     )
 
 
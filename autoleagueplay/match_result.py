@@ -1,7 +1,7 @@
 import json
 import random
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 
 class MatchResult:
@@ -10,7 +10,9 @@ class MatchResult:
     """
 
     def __init__(self, blue: str, orange: str, blue_goals: int, orange_goals: int, blue_shots: int, orange_shots: int,
-                 blue_saves: int, orange_saves: int, blue_points: int, orange_points: int):
+                 blue_saves: int, orange_saves: int, blue_points: int, orange_points: int, replay_id: str=None,
+                 timestamp: float=None, shortened: bool=False, frame_pacing: dict=None, poor_pacing: bool=False,
+                 duration: float=None):
         self.blue = blue
         self.orange = orange
         self.blue_goals = blue_goals
@@ -23,6 +25,14 @@ class MatchResult:
         self.orange_points = orange_points
         self.winner = blue if blue_goals > orange_goals else orange
         self.loser = blue if blue_goals < orange_goals else orange
+        self.replay_id = replay_id
+        self.timestamp = timestamp  # Seconds since epoch at the end of the match. None for old results
+        self.shortened = shortened  # True if the match was ended early because the result was decided
+        self.frame_pacing = frame_pacing  # Fields of a FramePacing. None for old results
+        self.poor_pacing = poor_pacing  # True if the game ran too unevenly for the result to be trusted
+        # Seconds from setting up the match until its result, including retries and waiting for the replay.
+        # None for old results
+        self.duration = duration
 
     def write(self, path: Path):
         with open(path, 'w') as f:
@@ -42,7 +52,13 @@ class MatchResult:
                                 blue_saves=int(data['blue_saves']),
                                 orange_saves=int(data['orange_saves']),
                                 blue_points=int(data['blue_points']),
-                                orange_points=int(data['orange_points'])
+                                orange_points=int(data['orange_points']),
+                                replay_id=data.get('replay_id'),
+                                timestamp=data.get('timestamp'),
+                                shortened=bool(data.get('shortened', False)),
+                                frame_pacing=data.get('frame_pacing'),
+                                poor_pacing=bool(data.get('poor_pacing', False)),
+                                duration=data.get('duration')
                             )
 
 
@@ -74,22 +90,35 @@ class CombinedScore:
             return self.points < other.points
         return random.randint(0, 1) == 0
 
+    def ranking_key(self) -> Tuple[int, int, int, int, int, str]:
+        """
+        Returns a key that sorts the best performance first. Unlike __lt__, ties are broken by bot name, so sorting
+        with this key is deterministic.
+        """
+        return -self.goal_diff, -self.goals, -self.shots, -self.saves, -self.points, self.bot
+
+    def add_result(self, result: MatchResult):
+        """
+        Adds the bot's performance in the given match to this score. Matches the bot did not play in are ignored.
+        """
+        if self.bot == result.blue:
+            self.goal_diff += result.blue_goals
+            self.goal_diff -= result.orange_goals
+            self.goals += result.blue_goals
+            self.shots += result.blue_shots
+            self.saves += result.blue_saves
+            self.points += result.blue_points
+        elif self.bot == result.orange:
+            self.goal_diff += result.orange_goals
+            self.goal_diff -= result.blue_goals
+            self.goals += result.orange_goals
+            self.shots += result.orange_shots
+            self.saves += result.orange_saves
+            self.points += result.orange_points
+
     @staticmethod
     def calc_score(bot: str, match_results: List[MatchResult]) -> 'CombinedScore':
         score = CombinedScore(bot, 0, 0, 0, 0, 0)
         for result in match_results:
-            if bot == result.blue:
-                score.goal_diff += result.blue_goals
-                score.goal_diff -= result.orange_goals
-                score.goals += result.blue_goals
-                score.shots += result.blue_shots
-                score.saves += result.blue_saves
-                score.points += result.blue_points
-            elif bot == result.orange:
-                score.goal_diff += result.orange_goals
-                score.goal_diff -= result.blue_goals
-                score.goals += result.orange_goals
-                score.shots += result.orange_shots
-                score.saves += result.orange_saves
-                score.points += result.orange_points
+            score.add_result(result)
         return score
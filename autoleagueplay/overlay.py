@@ -3,10 +3,12 @@ from pathlib import Path
 
 
 class OverlayData:
-    def __init__(self, division: int, blue_config_path: str, orange_config_path: str):
+    def __init__(self, division: int, blue_config_path: str, orange_config_path: str, standings: dict=None):
         self.division = division
         self.blue_config_path = blue_config_path
         self.orange_config_path = orange_config_path
+        # The live standings of the event so far, see LiveStandings
+        self.standings = standings
 
     def write(self, path: Path):
         with open(path, 'w') as f:
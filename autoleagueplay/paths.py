@@ -9,21 +9,49 @@
 #     # This directory contains the match results. One json file for each match with all the info
 #     quantum_bot1_vs_bot2_result.json
 #     quantum_bot1_vs_bot3_result.json
+#     bot1-<version>_vs_bot2-<version>.json   # Result of a bubble sort comparison
+#     bot1-<version>_vs_bot2-<version>_game2.json   # Second game of the same comparison, if it is a series
+#     bracket_<event>_W1-1_bot1_vs_bot2.json   # Result of a match in an elimination bracket
 #     ...
+# <ladder>_bracket_<event>.json   # The seeds and the state of every match of an elimination bracket.
+# <ladder>_live.json   # The standings and provisional new ladder of league play, updated after every match.
+# <ladder>_history.jsonl   # Every earlier state of the ladder, stored as changes between them. One per line.
+# <ladder>_recoveries.jsonl   # A line for every time a stalled match was torn down and retried.
+# <ladder>_resources/
+#     # The resources used by the bots of each match, if sampled. Named like the match result.
+#     quantum_bot1_vs_bot2_result.json
+#     ...
+# <ladder>_replays.json   # Maps the id of each replay to the name of its match result. Made by the replays command.
+# <ladder>_replay_archive/
+#     # The replays of matches with a result, compressed and named by the sha256 hash of the replay. Made by the archive command
+#     index.json   # The results, replay ids, sizes and time of the match of each archived replay
+#     3f/3f2a9c0e...1b7d.replay.gz
+#     ...
+# <ladder>_versions.json   # The version of each bot when the watch command last placed it on the ladder.
+# <ladder>_inferred.jsonl   # A line for every bubble sort comparison decided by the head-to-head history.
+# <ladder>_logos/
+#     # The logos of the bots scaled for the overlay, named by the hash of the original logo, and sprite sheets of them
+#     index.json   # The hash of the logo of each versioned bot
+#     3f2a9c0e1b7d4a65.png
+#     sprites_8d1e5b2f0c9a7e34.png   # A sprite sheet of logos, with the position of each logo in a .json next to it
+#     ...
+# <ladder>_results.csv.gz   # All match results in a single compressed table. Created by the export command.
+# <ladder>_results.csv.gz.exported   # The names of the results already in the export. One per line.
 #
 
 """
 This module contains file system paths that are used by autoleagueplay.
 """
 from pathlib import Path
-from typing import Mapping
-
-from rlbot.parsing.bot_config_bundle import BotConfigBundle
-from rlbot.parsing.directory_scanner import scan_directory_for_bot_configs
+from typing import List, Mapping, TYPE_CHECKING
 
 from autoleagueplay.ladder import Ladder
 from autoleagueplay.versioned_bot import VersionedBot
 
+if TYPE_CHECKING:
+    # rlbot is slow to import and not needed to look at results, so it is only imported when bots are loaded
+    from rlbot.parsing.bot_config_bundle import BotConfigBundle
+
 
 class WorkingDir:
     """
@@ -38,6 +66,16 @@ class WorkingDir:
         self.match_results = working_dir / f'{ladder_path.stem}_results'
         self.bots = working_dir / 'bots'
         self.overlay_interface = working_dir / 'current_match.json'
+        self.results_export = working_dir / f'{ladder_path.stem}_results.csv.gz'
+        self.ladder_history = working_dir / f'{ladder_path.stem}_history.jsonl'
+        self.match_recoveries = working_dir / f'{ladder_path.stem}_recoveries.jsonl'
+        self.resource_usage = working_dir / f'{ladder_path.stem}_resources'
+        self.replay_index = working_dir / f'{ladder_path.stem}_replays.json'
+        self.replay_archive = working_dir / f'{ladder_path.stem}_replay_archive'
+        self.bot_versions = working_dir / f'{ladder_path.stem}_versions.json'
+        self.inferred_decisions = working_dir / f'{ladder_path.stem}_inferred.jsonl'
+        self.logo_cache = working_dir / f'{ladder_path.stem}_logos'
+        self.live_standings = working_dir / f'{ladder_path.stem}_live.json'
         self._ensure_directory_structure()
 
     def _ensure_directory_structure(self):
@@ -48,13 +86,32 @@ class WorkingDir:
         match_name = f'{Ladder.DIVISION_NAMES[division_index]}_{blue}_vs_{orange}.json'
         return self.match_results / match_name
 
-    def get_version_specific_match_result(self, bot1: VersionedBot, bot2: VersionedBot) -> Path:
+    def get_version_specific_match_result(self, bot1: VersionedBot, bot2: VersionedBot, game_index: int=0) -> Path:
+        """
+        Returns the path of a result between two specific versions of bots. When bots play a series of games, each
+        game after the first one gets its own file with the game number as suffix.
+        """
         bot_keys = [bot1.get_key(), bot2.get_key()]
         bot_keys.sort()
-        match_name = f'{bot_keys[0]}_vs_{bot_keys[1]}.json'
+        game_suffix = f'_game{game_index + 1}' if game_index > 0 else ''
+        match_name = f'{bot_keys[0]}_vs_{bot_keys[1]}{game_suffix}.json'
         return self.match_results / match_name
 
-    def get_bots(self) -> Mapping[str, BotConfigBundle]:
+    def get_bracket(self, event: str) -> Path:
+        return self._working_dir / f'{self.ladder.stem}_bracket_{event}.json'
+
+    def get_brackets(self) -> List[Path]:
+        return sorted(self._working_dir.glob(f'{self.ladder.stem}_bracket_*.json'))
+
+    def get_bracket_match_result(self, event: str, match_id: str, blue: str, orange: str) -> Path:
+        match_name = f'bracket_{event}_{match_id}_{blue}_vs_{orange}.json'
+        return self.match_results / match_name
+
+    def get_resource_usage(self, match_result: Path) -> Path:
+        return self.resource_usage / match_result.name
+
+    def get_bots(self) -> Mapping[str, 'BotConfigBundle']:
+        from rlbot.parsing.directory_scanner import scan_directory_for_bot_configs
         return {
             bot_config.name.lower(): bot_config
             for bot_config in scan_directory_for_bot_configs(self.bots)
@@ -75,3 +132,7 @@ class PackageFiles:
 
     sheets_token = _package_dir / 'cred' / 'sheets-api-token.pickle'
     credentials = _package_dir / 'cred' / 'credentials.json'
+
+
+# Where Rocket League saves replays
+ROCKET_LEAGUE_REPLAY_DIR = Path.home() / 'documents' / 'My Games' / 'Rocket League' / 'TAGame' / 'Demos'
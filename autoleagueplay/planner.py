@@ -0,0 +1,146 @@
+import json
+import random
+import statistics
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from autoleagueplay.generate_matches import generate_round_robin_matches, get_playing_division_indices
+from autoleagueplay.ladder import Ladder
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.result_history import iter_stored_results
+
+# The scripts sleep this long after each match
+LEAGUE_SLEEP = 8
+BUBBLE_SLEEP = 12
+# A bubble sort sleeps this long when it is complete, to show the overlay
+BUBBLE_END_SLEEP = 10
+# Used until there are durations to learn from
+DEFAULT_DURATION = 7 * 60
+# Results further apart than this were not played back to back, so the time between them is not a match duration
+MAX_GAP = 30 * 60
+# Bubble sort results further apart than this belong to different runs
+RUN_GAP = 60 * 60
+# Once this many results have a measured duration, the durations estimated from older results are not used
+MIN_MEASURED = 10
+SIMULATIONS = 1000
+PERCENTILES = [50, 90, 99]
+
+
+def collect_durations(working_dir: WorkingDir) -> List[float]:
+    """
+    Returns the wall-clock durations of earlier matches, from setting up the match until its result, which includes
+    overtime and waiting for the replay, but not the sleep after the match. Old results have no measured duration,
+    so for them the time since the previous result of the same kind is used if the two were played back to back.
+    """
+    measured = []
+    timestamps: Dict[str, List[float]] = {'league': [], 'bubble': []}
+    for stored in iter_stored_results(working_dir):
+        result = stored.result
+        if result.duration is not None:
+            measured.append(result.duration)
+        elif result.timestamp is not None:
+            timestamps['league' if stored.division is not None else 'bubble'].append(result.timestamp)
+    if len(measured) >= MIN_MEASURED:
+        return measured
+
+    estimated = []
+    for kind, kind_timestamps in timestamps.items():
+        sleep = LEAGUE_SLEEP if kind == 'league' else BUBBLE_SLEEP
+        kind_timestamps.sort()
+        for previous, current in zip(kind_timestamps, kind_timestamps[1:]):
+            if sleep < current - previous <= MAX_GAP:
+                estimated.append(current - previous - sleep)
+    return measured + estimated
+
+
+def collect_bubble_run_sizes(working_dir: WorkingDir) -> List[int]:
+    """
+    Returns the number of games played in each earlier bubble sort run. Runs are told apart by the time between their
+    results.
+    """
+    timestamps = sorted(stored.result.timestamp for stored in iter_stored_results(working_dir)
+                        if stored.division is None and stored.result.timestamp is not None)
+    run_sizes = []
+    previous = None
+    for timestamp in timestamps:
+        if previous is None or timestamp - previous > RUN_GAP:
+            run_sizes.append(0)
+        run_sizes[-1] += 1
+        previous = timestamp
+    return run_sizes
+
+
+def get_league_schedule(working_dir: WorkingDir, ladder: Ladder, odd_week: bool) -> List[int]:
+    """
+    Returns the number of matches left to play in each round robin, in the order run_league_play plays them.
+    """
+    schedule = []
+    for div_index in list(get_playing_division_indices(ladder, odd_week))[::-1]:
+        rr_bots = ladder.round_robin_participants(div_index)
+        unplayed = [match for match in generate_round_robin_matches(rr_bots)
+                    if not working_dir.get_match_result(div_index, match[0], match[1]).exists()]
+        schedule.append(len(unplayed))
+    return schedule
+
+
+def simulate_runtime(match_count: int, durations: List[float], sleep: float, rng: random.Random) -> float:
+    """
+    Returns the runtime of one simulated run. The matches are played one at a time, like the match scheduler does,
+    and the duration of each match is drawn from the earlier durations.
+    """
+    return sum(rng.choice(durations) + sleep for _ in range(match_count))
+
+
+def percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def print_plan(working_dir: WorkingDir, mode: str, as_json: bool):
+    """
+    Predicts how long league play or a bubble sort of the current ladder will take, by simulating the run many times
+    with match durations drawn from earlier matches. Matches are played one at a time on the single game instance.
+    A league week plays the matches left in its round robins. A bubble sort plays as many games as a random earlier
+    bubble sort run, or a single pass over the ladder if there were none.
+    """
+    ladder = Ladder.read(working_dir.ladder)
+    earlier_durations = collect_durations(working_dir)
+    durations = earlier_durations or [DEFAULT_DURATION]
+    run_sizes = collect_bubble_run_sizes(working_dir) if mode == 'bubble' else []
+    league_schedule = get_league_schedule(working_dir, ladder, mode == 'odd') if mode != 'bubble' else []
+
+    rng = random.Random(0)
+    if not as_json:
+        if mode == 'bubble':
+            print(f'Bubble sort of {len(ladder.bots)} bots, using {len(run_sizes)} earlier runs')
+        else:
+            print(f'{mode.capitalize()} week with {sum(league_schedule)} matches left')
+        if not earlier_durations:
+            print(f'No earlier match durations were found. Assuming {DEFAULT_DURATION / 60:.0f} minutes per match.')
+        else:
+            print(f'The median of {len(durations)} earlier matches took {statistics.median(durations) / 60:.1f} minutes')
+        print(f'{"mean":>9}' + ''.join(f'{f"p{p}":>9}' for p in PERCENTILES) + f'{"done by (p90)":>16}')
+
+    runtimes = []
+    for _ in range(SIMULATIONS):
+        if mode == 'bubble':
+            games = rng.choice(run_sizes) if run_sizes else max(0, len(ladder.bots) - 1)
+            runtimes.append(simulate_runtime(games, durations, BUBBLE_SLEEP, rng) + BUBBLE_END_SLEEP)
+        else:
+            runtimes.append(simulate_runtime(sum(league_schedule), durations, LEAGUE_SLEEP, rng))
+
+    mean = statistics.mean(runtimes)
+    percentiles = {p: percentile(runtimes, p) for p in PERCENTILES}
+    done_by = datetime.fromtimestamp(time.time() + percentiles[90])
+    if as_json:
+        print(json.dumps({'mean_seconds': mean, **{f'p{p}_seconds': value for p, value in percentiles.items()},
+                          'p90_done_by': done_by.isoformat(timespec='minutes')}))
+        return
+    print(f'{format_duration(mean):>9}' + ''.join(f'{format_duration(percentiles[p]):>9}' for p in PERCENTILES) +
+          f'{done_by.strftime("%a %H:%M"):>16}')
+
+
+def format_duration(seconds: float) -> str:
+    minutes = round(seconds / 60)
+    return f'{minutes // 60}h{minutes % 60:02d}m'
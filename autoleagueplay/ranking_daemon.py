@@ -0,0 +1,130 @@
+import json
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from autoleagueplay.bubble_sort import BubbleSorter
+from autoleagueplay.frame_pacing import PacingPolicy
+from autoleagueplay.head_to_head import PredictionPolicy
+from autoleagueplay.ladder import Ladder
+from autoleagueplay.match_exercise import MercyRule
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.replays import ReplayPreference
+from autoleagueplay.run_matches import MatchRunner
+from autoleagueplay.scheduler import ResourceBudget
+from autoleagueplay.series import SeriesPolicy
+
+
+class BotRepoWatcher:
+    """
+    Polls the git repository of the bots for new commits. Commits that are pushed shortly after each other, e.g. a bot
+    update and a fix for it, are handled together: a change is only reported once the repository has stopped changing
+    for the debounce time.
+    """
+
+    def __init__(self, git_root: Path, poll_interval: float, debounce: float):
+        self.git_root = git_root
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+
+    def get_head(self) -> Optional[str]:
+        """
+        Returns the newest commit of the upstream branch, or of the local branch if it has no upstream.
+        """
+        subprocess.call(['git', 'fetch', '--quiet'], cwd=self.git_root)
+        for rev in ('@{u}', 'HEAD'):
+            try:
+                return subprocess.check_output(['git', 'rev-parse', '--verify', '--quiet', rev], cwd=self.git_root,
+                                               stderr=subprocess.DEVNULL).decode().strip()
+            except subprocess.CalledProcessError:
+                continue
+        return None
+
+    def wait_for_change(self, known_head: Optional[str]) -> Optional[str]:
+        """
+        Blocks until the repository has changed since known_head and then stayed the same for the debounce time.
+        Returns the new head.
+        """
+        head = known_head
+        changed_at = None
+        while True:
+            time.sleep(self.poll_interval)
+            latest = self.get_head()
+            if latest != head:
+                head = latest
+                changed_at = time.time()
+                print(f'Bots repository changed to {head}. Waiting for it to settle.')
+            if changed_at is not None and time.time() - changed_at >= self.debounce:
+                return head
+
+
+def read_bot_versions(path: Path) -> Dict[str, str]:
+    if not path.exists():
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_bot_versions(path: Path, versions: Dict[str, str]):
+    with open(path, 'w') as f:
+        json.dump(versions, f, indent=4, sort_keys=True)
+
+
+def get_changed_bots(ladder: Ladder, known_versions: Dict[str, str], versions: Dict[str, str]) -> List[str]:
+    """
+    Returns the bots whose versioned key is not the one they were last placed with, from the top of the ladder down.
+    """
+    return [bot for bot in ladder.bots if bot in versions and known_versions.get(bot) != versions[bot]]
+
+
+def run_ranking_daemon(working_dir: WorkingDir, team_size: int, replay_preference: ReplayPreference,
+                       reuse_bot_processes: bool=False, mercy_rule: MercyRule=None, series_policy: SeriesPolicy=None,
+                       stall_timeout: float=60, time_limit: float=1800, budget: ResourceBudget=None,
+                       sample_resources: bool=False, pacing_policy: PacingPolicy=None, poll_interval: float=60,
+                       debounce: float=120, prediction_policy: PredictionPolicy=None):
+    """
+    Keeps the ladder sorted as bots are updated. Each time the bots repository changes, only the bots with a new
+    version are moved to their place, by playing them against their neighbours on the ladder. New bots start at the
+    bottom. Runs until interrupted, or until the ladder is empty and there are no bots to place.
+    The version each bot was last placed with is stored, so updates pushed while the daemon was not running are picked
+    up when it starts. The first time, the ladder is assumed to be sorted for the current versions.
+    """
+    ladder = Ladder.read(working_dir.ladder)
+    budget = budget or ResourceBudget()
+    watcher = BotRepoWatcher(working_dir._working_dir, poll_interval, debounce)
+
+    with MatchRunner(reuse_bot_processes, mercy_rule, stall_timeout, time_limit,
+                     recovery_log=working_dir.match_recoveries, cores=budget.cores,
+                     pacing_policy=pacing_policy, sample_resources=sample_resources) as match_runner:
+        sorter = BubbleSorter(ladder, working_dir, team_size, replay_preference, match_runner, series_policy,
+                              sample_resources, prediction_policy=prediction_policy)
+
+        known_versions = read_bot_versions(working_dir.bot_versions)
+        head = watcher.get_head()
+        while True:
+            sorter.try_gather_versioned_bots()
+            versions = {bot: versioned_bot.get_key() for bot, versioned_bot in sorter.versioned_bots_by_name.items()}
+            if not known_versions:
+                print('No placed versions are known yet. Assuming the ladder is sorted.')
+                known_versions = dict(versions)
+
+            changed_bots = get_changed_bots(sorter.ladder, known_versions, versions)
+            print(f'{len(changed_bots)} bots have changed: {", ".join(changed_bots)}')
+            for bot in changed_bots:
+                sorter.replace_bot(bot)
+                # Stored after each bot, so a restart continues with the bots that are left
+                known_versions[bot] = versions[bot]
+                write_bot_versions(working_dir.bot_versions, known_versions)
+
+            # Forget the bots that were removed, so they are placed again if they come back
+            known_versions = {bot: key for bot, key in known_versions.items() if bot in versions}
+            write_bot_versions(working_dir.bot_versions, known_versions)
+
+            if not sorter.ladder.bots:
+                print(f'The ladder is empty and there are no bots in {working_dir._working_dir} to place. Stopping.')
+                return
+            sorter.write_overlay(0, False, winner=sorter.ladder.bots[0], sort_complete=True)
+
+            print('Waiting for bot updates.')
+            head = watcher.wait_for_change(head)
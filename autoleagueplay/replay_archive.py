@@ -0,0 +1,233 @@
+import fnmatch
+import gzip
+import hashlib
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.replay_index import read_replay_index
+from autoleagueplay.result_history import iter_stored_results
+
+# Replays are hashed and compressed this many bytes at a time, so they are never held in memory
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    Decides how much disk space the archive may use and which replays are kept no matter what. When the archive is
+    over budget_bytes, the replays of the oldest matches are removed first. The replays of bracket finals are always
+    kept, as are the replays of results whose name matches one of the protected glob patterns, e.g. 'quantum_*' for
+    the final week of a season. No budget means the archive may grow without limit.
+    """
+
+    budget_bytes: Optional[int] = None
+    protected_patterns: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ArchivedReplay:
+    """
+    A replay in the archive, stored under the sha256 hash of its content. A replay that was found more than once is
+    only stored once, so it can belong to several results.
+    """
+
+    results: List[str]
+    replay_ids: List[str]
+    size: int
+    stored_size: int
+    timestamp: float  # Seconds since epoch at the end of its match, or when it was archived for old results
+
+
+def hash_and_compress(source: Path, target: Path) -> str:
+    """
+    Compresses the source file into the target file and returns the sha256 hash of the source, reading it once.
+    """
+    digest = hashlib.sha256()
+    with open(source, 'rb') as src, open(target, 'wb') as raw_dst:
+        # mtime=0 makes the compressed file depend only on the replay
+        with gzip.GzipFile(fileobj=raw_dst, mode='wb', mtime=0) as dst:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+    return digest.hexdigest()
+
+
+def get_championship_results(working_dir: WorkingDir) -> Set[str]:
+    """
+    Returns the name prefixes of the results of the final of every bracket, and of the grand final and its reset in
+    double elimination brackets.
+    """
+    prefixes = set()
+    for bracket_path in working_dir.get_brackets():
+        with open(bracket_path, 'r') as f:
+            data = json.load(f)
+        if data['double_elimination']:
+            final_ids = ['GF', 'GF2']
+        else:
+            final_ids = [f'W{math.ceil(math.log2(max(2, len(data["seeds"]))))}-1']
+        prefixes.update(f'bracket_{data["event"]}_{match_id}_' for match_id in final_ids)
+    return prefixes
+
+
+class ReplayArchive:
+    """
+    A content-addressed store of compressed replays. Each replay of a match with a result is moved out of the replay
+    folder into the archive, named by the hash of its content, and the index links it to the match result. Replays
+    without a result, e.g. of matches that are still being played, are left where they are.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.index_path = directory / 'index.json'
+        self.replays: Dict[str, ArchivedReplay] = {}
+        if self.index_path.exists():
+            with open(self.index_path, 'r') as f:
+                self.replays = {content_hash: ArchivedReplay(**data) for content_hash, data in json.load(f).items()}
+
+    def get_replay_path(self, content_hash: str) -> Path:
+        return self.directory / content_hash[:2] / f'{content_hash}.replay.gz'
+
+    def get_result_replay(self, result_name: str) -> Optional[Path]:
+        """
+        Returns the archived replay of the match result, or None if it is not in the archive.
+        """
+        for content_hash, replay in self.replays.items():
+            if result_name in replay.results:
+                return self.get_replay_path(content_hash)
+        return None
+
+    def get_stored_size(self) -> int:
+        return sum(replay.stored_size for replay in self.replays.values())
+
+    def add(self, replay_path: Path, result_name: str, timestamp: float) -> bool:
+        """
+        Moves the replay into the archive and writes the index. Returns False if the same replay is already in the
+        archive, in which case the copy is deleted and only the link to the result is added.
+        """
+        self.directory.mkdir(exist_ok=True)
+        temp_path = self.directory / f'{replay_path.name}.tmp'
+        try:
+            content_hash = hash_and_compress(replay_path, temp_path)
+        except OSError:
+            if temp_path.exists():
+                temp_path.unlink()
+            raise
+
+        replay = self.replays.get(content_hash)
+        archived_path = self.get_replay_path(content_hash)
+        # A replay whose archived copy was removed by hand is stored again
+        is_stored = replay is None or not archived_path.exists()
+        if is_stored:
+            archived_path.parent.mkdir(exist_ok=True)
+            temp_path.replace(archived_path)
+        else:
+            temp_path.unlink()
+        if replay is None:
+            replay = ArchivedReplay([], [], replay_path.stat().st_size, archived_path.stat().st_size, timestamp)
+            self.replays[content_hash] = replay
+        if result_name not in replay.results:
+            replay.results.append(result_name)
+        if replay_path.stem not in replay.replay_ids:
+            replay.replay_ids.append(replay_path.stem)
+
+        # The original is only removed once the archived copy is in place and in the index
+        self.write()
+        replay_path.unlink()
+        return is_stored
+
+    def is_protected(self, replay: ArchivedReplay, policy: RetentionPolicy, championship: Set[str]) -> bool:
+        return any(result.startswith(prefix) for result in replay.results for prefix in championship) or \
+            any(fnmatch.fnmatch(result, pattern) for result in replay.results for pattern in policy.protected_patterns)
+
+    def evict(self, policy: RetentionPolicy, championship: Set[str]) -> List[str]:
+        """
+        Removes the replays of the oldest matches that are not protected until the archive fits in the budget.
+        Returns the hashes of the removed replays.
+        """
+        if policy.budget_bytes is None:
+            return []
+        # A replay whose archived copy was removed by hand is already evicted, and no longer takes up space
+        evicted = [content_hash for content_hash in self.replays if not self.get_replay_path(content_hash).exists()]
+        stored_size = self.get_stored_size() - sum(self.replays[content_hash].stored_size for content_hash in evicted)
+        for content_hash, replay in sorted(self.replays.items(), key=lambda item: item[1].timestamp):
+            if stored_size <= policy.budget_bytes:
+                break
+            if content_hash in evicted or self.is_protected(replay, policy, championship):
+                continue
+            replay_path = self.get_replay_path(content_hash)
+            try:
+                replay_path.unlink()
+            except FileNotFoundError:
+                pass
+            try:
+                if not any(replay_path.parent.iterdir()):
+                    replay_path.parent.rmdir()
+            except OSError:
+                pass
+            stored_size -= replay.stored_size
+            evicted.append(content_hash)
+        for content_hash in evicted:
+            del self.replays[content_hash]
+        return evicted
+
+    def write(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({content_hash: replay.__dict__ for content_hash, replay in self.replays.items()},
+                      f, indent=4, sort_keys=True)
+        temp_path.replace(self.index_path)
+
+
+def archive_replays(working_dir: WorkingDir, replay_dir: Path, policy: RetentionPolicy):
+    """
+    Moves the replay of every match result from the replay folder into the replay archive, and then removes the
+    replays of the oldest unprotected matches until the archive fits in the budget.
+    Replays are linked to results by the replay id stored in the result, or by the replay index made by the replays
+    command for results that were rebuilt from their replay.
+    """
+    results_by_replay = {
+        stored.result.replay_id: stored
+        for stored in iter_stored_results(working_dir)
+        if stored.result.replay_id is not None
+    }
+    indexed_results = read_replay_index(working_dir.replay_index)
+    archive = ReplayArchive(working_dir.replay_archive)
+
+    archived_count = 0
+    duplicate_count = 0
+    for replay_path in sorted(replay_dir.rglob('*.replay')):
+        stored = results_by_replay.get(replay_path.stem)
+        if stored is not None:
+            result_name = stored.path.name
+            timestamp = stored.result.timestamp
+        elif replay_path.stem in indexed_results:
+            result_name = indexed_results[replay_path.stem]
+            timestamp = None
+        else:
+            continue
+        try:
+            is_stored = archive.add(replay_path, result_name, timestamp if timestamp is not None else time.time())
+        except OSError as e:
+            print(f'Could not archive {replay_path.name}: {e}')
+            continue
+        archived_count += is_stored
+        duplicate_count += not is_stored
+
+    evicted = archive.evict(policy, get_championship_results(working_dir))
+    archive.write()
+
+    stored_size = archive.get_stored_size()
+    print(f'Archived {archived_count} replays and dropped {duplicate_count} duplicates. '
+          f'Removed {len(evicted)} old replays to stay within the budget.')
+    print(f'The archive has {len(archive.replays)} replays using {stored_size / 1024 ** 2:.1f} MB.')
+    if policy.budget_bytes is not None and stored_size > policy.budget_bytes:
+        print(f'The protected replays alone use more than the budget of {policy.budget_bytes / 1024 ** 2:.1f} MB.')
@@ -0,0 +1,178 @@
+import struct
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+
+# Strings longer than this are a sign of a corrupt file, and are not read
+MAX_STRING_LENGTH = 1 << 16
+
+# Byte properties of these kinds have no value
+VALUELESS_BYTE_PROPERTIES = ['OnlinePlatform_Steam', 'OnlinePlatform_PS4']
+
+
+class ReplayParseError(Exception):
+    pass
+
+
+@dataclass
+class ReplayPlayer:
+    name: str
+    team: int
+    score: int = 0
+    goals: int = 0
+    shots: int = 0
+    saves: int = 0
+
+
+@dataclass
+class ReplayGoal:
+    player: str
+    team: int
+    frame: int
+
+
+@dataclass
+class ReplayHeader:
+    """
+    The summary of a match that Rocket League stores at the start of a replay file. The properties contain everything
+    that was in the header, including what isn't given a field of its own.
+    """
+
+    replay_id: str
+    date: Optional[datetime]
+    team_size: int
+    blue_score: int
+    orange_score: int
+    players: List[ReplayPlayer] = field(default_factory=list)
+    goals: List[ReplayGoal] = field(default_factory=list)
+    properties: Dict[str, Any] = field(default_factory=dict)
+
+    def team_players(self, team: int) -> List[ReplayPlayer]:
+        return [player for player in self.players if player.team == team]
+
+
+class HeaderReader:
+    """
+    Reads the header of a replay straight from the file. Only the header is read, which is a few kilobytes at the start
+    of the file, while the network data after it is often several megabytes.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+
+    def read(self, size: int) -> bytes:
+        data = self.file.read(size)
+        if len(data) != size:
+            raise ReplayParseError('Unexpected end of file')
+        return data
+
+    def read_int32(self) -> int:
+        return struct.unpack('<i', self.read(4))[0]
+
+    def read_uint32(self) -> int:
+        return struct.unpack('<I', self.read(4))[0]
+
+    def read_uint64(self) -> int:
+        return struct.unpack('<Q', self.read(8))[0]
+
+    def read_float(self) -> float:
+        return struct.unpack('<f', self.read(4))[0]
+
+    def read_string(self) -> str:
+        length = self.read_int32()
+        if abs(length) > MAX_STRING_LENGTH:
+            raise ReplayParseError(f'String of length {length} is too long')
+        if length < 0:
+            # Negative lengths are UTF-16 strings with that many characters
+            return self.read(-length * 2).decode('utf-16-le').rstrip('\0')
+        return self.read(length).decode('latin-1').rstrip('\0')
+
+    def read_properties(self) -> Dict[str, Any]:
+        """
+        Reads a list of properties, which ends with a property called 'None'.
+        """
+        properties = {}
+        while True:
+            name = self.read_string()
+            if name == 'None':
+                return properties
+            kind = self.read_string()
+            self.read_uint64()  # Size of the value
+            properties[name] = self.read_value(kind)
+
+    def read_value(self, kind: str) -> Any:
+        if kind == 'IntProperty':
+            return self.read_int32()
+        if kind in ('StrProperty', 'NameProperty'):
+            return self.read_string()
+        if kind == 'FloatProperty':
+            return self.read_float()
+        if kind == 'BoolProperty':
+            return self.read(1)[0] != 0
+        if kind == 'QWordProperty':
+            return self.read_uint64()
+        if kind == 'ByteProperty':
+            byte_kind = self.read_string()
+            return byte_kind if byte_kind in VALUELESS_BYTE_PROPERTIES else self.read_string()
+        if kind == 'ArrayProperty':
+            return [self.read_properties() for _ in range(self.read_int32())]
+        raise ReplayParseError(f'Unknown property type {kind}')
+
+    def read_header_properties(self) -> Dict[str, Any]:
+        self.read_int32()  # Size of the header
+        self.read_uint32()  # CRC of the header
+        engine_version = self.read_uint32()
+        licensee_version = self.read_uint32()
+        if engine_version >= 868 and licensee_version >= 18:
+            self.read_uint32()  # Net version
+        class_name = self.read_string()
+        if class_name != 'TAGame.Replay_Soccar_TA':
+            raise ReplayParseError(f'Unexpected replay class {class_name}')
+        return self.read_properties()
+
+
+def parse_replay_date(date: Optional[str]) -> Optional[datetime]:
+    # Rocket League writes the local time, e.g. '2019-05-20 18-00-00'
+    if date is None:
+        return None
+    try:
+        return datetime.strptime(date, '%Y-%m-%d %H-%M-%S')
+    except ValueError:
+        return None
+
+
+def read_replay_header(replay_path: Path) -> ReplayHeader:
+    """
+    Reads the header of the replay file. Raises a ReplayParseError if the file is not a replay of a soccar match.
+    """
+    with open(replay_path, 'rb') as f:
+        properties = HeaderReader(f).read_header_properties()
+
+    players = [
+        ReplayPlayer(
+            name=stats.get('Name', ''),
+            team=stats.get('Team', 0),
+            score=stats.get('Score', 0),
+            goals=stats.get('Goals', 0),
+            shots=stats.get('Shots', 0),
+            saves=stats.get('Saves', 0),
+        )
+        for stats in properties.get('PlayerStats', [])
+    ]
+    goals = [
+        ReplayGoal(player=goal.get('PlayerName', ''), team=goal.get('PlayerTeam', 0), frame=goal.get('frame', 0))
+        for goal in properties.get('Goals', [])
+    ]
+    return ReplayHeader(
+        # The file is named after the id of the replay, which is also the id stored in match results
+        replay_id=replay_path.stem,
+        date=parse_replay_date(properties.get('Date')),
+        team_size=properties.get('TeamSize', 0),
+        # Scores are left out of the header when they are 0
+        blue_score=properties.get('Team0Score', 0),
+        orange_score=properties.get('Team1Score', 0),
+        players=players,
+        goals=goals,
+        properties=properties,
+    )
@@ -0,0 +1,164 @@
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from autoleagueplay.ladder import Ladder
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.replay_header import ReplayHeader, ReplayParseError, read_replay_header
+from autoleagueplay.result_history import iter_stored_results
+
+
+def get_bot_name(player_name: str) -> str:
+    """
+    Returns the name of the bot controlling a player. RLBot adds a number to the names of bots that play several cars,
+    e.g. 'Botimus (2)'.
+    """
+    return re.sub(r' \(\d+\)$', '', player_name)
+
+
+def check_result(result: MatchResult, header: ReplayHeader) -> List[str]:
+    """
+    Returns the differences between a match result and the replay of the match. The list is empty if they agree.
+    """
+    problems = []
+    if (result.blue_goals, result.orange_goals) != (header.blue_score, header.orange_score):
+        problems.append(f'the result is {result.blue_goals}-{result.orange_goals}, '
+                        f'but the replay is {header.blue_score}-{header.orange_score}')
+    for team, bot in ((0, result.blue), (1, result.orange)):
+        names = {get_bot_name(player.name).lower() for player in header.team_players(team)}
+        if names and bot.lower() not in names:
+            problems.append(f'{bot} is not on team {team} in the replay, which has {", ".join(sorted(names))}')
+    return problems
+
+
+def rebuild_result(header: ReplayHeader) -> Optional[MatchResult]:
+    """
+    Makes the match result of the match in the replay, or returns None if the replay doesn't have a player on both
+    teams. Like the grader, the stats of the first player of each team are used.
+    """
+    blue_players, orange_players = header.team_players(0), header.team_players(1)
+    if not blue_players or not orange_players:
+        return None
+    blue, orange = blue_players[0], orange_players[0]
+    return MatchResult(
+        blue=get_bot_name(blue.name),
+        orange=get_bot_name(orange.name),
+        blue_goals=header.blue_score,
+        orange_goals=header.orange_score,
+        blue_shots=blue.shots,
+        orange_shots=orange.shots,
+        blue_saves=blue.saves,
+        orange_saves=orange.saves,
+        blue_points=blue.score,
+        orange_points=orange.score,
+        replay_id=header.replay_id,
+        timestamp=header.date.timestamp() if header.date is not None else None,
+    )
+
+
+def find_league_result_path(working_dir: WorkingDir, ladder: Ladder, header: ReplayHeader) -> Optional[Path]:
+    """
+    Returns the path of the league play result that the replay is a match of, or None if no match on the ladder fits.
+    In a round robin, the higher ranked bot plays blue.
+    """
+    blue_players, orange_players = header.team_players(0), header.team_players(1)
+    if not blue_players or not orange_players:
+        return None
+    blue, orange = get_bot_name(blue_players[0].name).lower(), get_bot_name(orange_players[0].name).lower()
+
+    candidates = []
+    for div_index in range(ladder.division_count()):
+        rr_bots = ladder.round_robin_participants(div_index)
+        participants = [bot.lower() for bot in rr_bots]
+        if blue in participants and orange in participants and participants.index(blue) < participants.index(orange):
+            candidates.append(working_dir.get_match_result(div_index, rr_bots[participants.index(blue)],
+                                                           rr_bots[participants.index(orange)]))
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def get_replay_date(replay_path: Path, header: ReplayHeader) -> datetime:
+    """
+    Returns the local time the replay was saved, from its header, or from the file if the header has no date.
+    """
+    if header.date is not None:
+        return header.date
+    return datetime.fromtimestamp(replay_path.stat().st_mtime)
+
+
+def read_replay_index(path: Path) -> Dict[str, str]:
+    if not path.exists():
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def index_replays(working_dir: WorkingDir, replay_dir: Path, rebuild: bool):
+    """
+    Links every replay in the replay directory to its match result by the replay id and checks that the two agree.
+    With rebuild, the results of league play matches that have a replay but no result, e.g. because the script
+    crashed right after the match, are made from the replays. Only replays saved after the ladder file was last
+    changed are used, since older replays can be of the same pairing in an earlier week. A result that more than one
+    such replay fits is not rebuilt, and the replays are reported instead. The links are saved in the replay index.
+    """
+    results_by_replay = {
+        stored.result.replay_id: stored
+        for stored in iter_stored_results(working_dir)
+        if stored.result.replay_id is not None
+    }
+    index = read_replay_index(working_dir.replay_index)
+    ladder = Ladder.read(working_dir.ladder)
+    ladder_date = datetime.fromtimestamp(working_dir.ladder.stat().st_mtime)
+
+    checked_count = 0
+    problem_count = 0
+    rebuilt_count = 0
+    unlinked_count = 0
+    # The replays that fit each missing result, by the path of the result
+    rebuild_candidates: Dict[Path, List[Path]] = {}
+    headers: Dict[Path, ReplayHeader] = {}
+    for replay_path in sorted(replay_dir.rglob('*.replay')):
+        try:
+            header = read_replay_header(replay_path)
+        except (ReplayParseError, OSError) as e:
+            print(f'Could not read {replay_path.name}: {e}')
+            continue
+
+        stored = results_by_replay.get(header.replay_id)
+        if stored is not None:
+            index[header.replay_id] = stored.path.name
+            checked_count += 1
+            for problem in check_result(stored.result, header):
+                print(f'{stored.path.name}: {problem}')
+                problem_count += 1
+            continue
+
+        result_path = None
+        if rebuild and get_replay_date(replay_path, header) > ladder_date:
+            result_path = find_league_result_path(working_dir, ladder, header)
+        if result_path is not None and not result_path.exists() and rebuild_result(header) is not None:
+            rebuild_candidates.setdefault(result_path, []).append(replay_path)
+            headers[replay_path] = header
+        else:
+            unlinked_count += 1
+
+    for result_path, replay_paths in sorted(rebuild_candidates.items()):
+        if len(replay_paths) > 1:
+            print(f'Not rebuilding {result_path.name}, since {len(replay_paths)} replays fit it: '
+                  f'{", ".join(replay_path.name for replay_path in replay_paths)}')
+            unlinked_count += len(replay_paths)
+            continue
+        replay_path = replay_paths[0]
+        header = headers[replay_path]
+        rebuild_result(header).write(result_path)
+        index[header.replay_id] = result_path.name
+        rebuilt_count += 1
+        print(f'Rebuilt {result_path.name} from {replay_path.name}')
+
+    with open(working_dir.replay_index, 'w') as f:
+        json.dump(index, f, indent=4, sort_keys=True)
+
+    print(f'Checked {checked_count} results against their replays and found {problem_count} problems. '
+          f'Rebuilt {rebuilt_count} results. {unlinked_count} replays have no result.')
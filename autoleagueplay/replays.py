@@ -8,6 +8,8 @@ from rlbottraining.history.metric import Metric
 from watchdog.events import LoggingEventHandler
 from watchdog.observers import Observer
 
+from autoleagueplay.paths import ROCKET_LEAGUE_REPLAY_DIR
+
 
 class ReplayPreference(Enum):
     SAVE = 'save'  # save to the default replays directory
@@ -73,6 +75,6 @@ class ReplayMonitor(Metric):
 
 
 def get_replay_dir() -> Path:
-    replay_dir = Path.home() / 'documents' / 'My Games' / 'Rocket League' / 'TAGame' / 'Demos'
+    replay_dir = ROCKET_LEAGUE_REPLAY_DIR
     assert replay_dir.exists()
     return replay_dir
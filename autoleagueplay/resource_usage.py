@@ -0,0 +1,140 @@
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.result_history import get_result_versions, get_version_date
+
+
+@dataclass
+class BotResourceUsage:
+    """
+    The resources used by the processes of a bot during a match. cores is the average number of cores kept busy per
+    player, and the memory and thread counts are the largest of any of the bot's players. rss_growth_mb is how much the
+    memory of a player grew from the first to the last sample, which is large for bots that leak memory.
+    """
+
+    cpu_seconds: float
+    cores: float
+    peak_rss_mb: float
+    rss_growth_mb: float
+    peak_threads: int
+    samples: int
+
+
+def write_resource_usage(path: Path, result: MatchResult, usage: Dict[str, BotResourceUsage]):
+    """
+    Writes the resource usage of the bots in a match. It is stored under the same name as the match result, so the
+    two can be matched up.
+    """
+    path.parent.mkdir(exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({
+            'blue': result.blue,
+            'orange': result.orange,
+            'bots': {bot: bot_usage.__dict__ for bot, bot_usage in usage.items()},
+        }, f, indent=4)
+
+
+def read_resource_usage(path: Path) -> List[Tuple[str, str, BotResourceUsage]]:
+    """
+    Returns the lowercase name, the versioned key and the resource usage of each bot in a match. The versioned key is
+    the name if the version is unknown, e.g. in league play.
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    blue_version, orange_version = get_result_versions(path.name, data['blue'], data['orange'])
+    keys = {
+        data['blue'].lower(): blue_version or data['blue'].lower(),
+        data['orange'].lower(): orange_version or data['orange'].lower(),
+    }
+    return [
+        (bot.lower(), keys.get(bot.lower(), bot.lower()), BotResourceUsage(**bot_usage))
+        for bot, bot_usage in data['bots'].items()
+    ]
+
+
+def iter_resource_usage(working_dir: WorkingDir) -> Iterator[List[Tuple[str, str, BotResourceUsage]]]:
+    if not working_dir.resource_usage.exists():
+        return
+    with os.scandir(working_dir.resource_usage) as entries:
+        names = sorted(entry.name for entry in entries if entry.is_file() and entry.name.endswith('.json'))
+    for name in names:
+        yield read_resource_usage(working_dir.resource_usage / name)
+
+
+@dataclass
+class BotCost:
+    """
+    The average resource usage of a bot, or a version of a bot, over all its sampled matches.
+    """
+
+    bot: str
+    key: str
+    matches: int = 0
+    cores: float = 0
+    cpu_seconds: float = 0
+    peak_rss_mb: float = 0
+    rss_growth_mb: float = 0
+    peak_threads: int = 0
+
+    def add_usage(self, usage: BotResourceUsage):
+        self.matches += 1
+        # Running means, so the costs never have to be held in memory
+        self.cores += (usage.cores - self.cores) / self.matches
+        self.cpu_seconds += (usage.cpu_seconds - self.cpu_seconds) / self.matches
+        self.rss_growth_mb += (usage.rss_growth_mb - self.rss_growth_mb) / self.matches
+        self.peak_rss_mb = max(self.peak_rss_mb, usage.peak_rss_mb)
+        self.peak_threads = max(self.peak_threads, usage.peak_threads)
+
+
+def aggregate_costs(working_dir: WorkingDir) -> Dict[str, BotCost]:
+    costs = {}
+    for match_usage in iter_resource_usage(working_dir):
+        for bot, key, usage in match_usage:
+            costs.setdefault(key, BotCost(bot, key)).add_usage(usage)
+    return costs
+
+
+def get_previous_version(cost: BotCost, costs: Dict[str, BotCost]) -> Optional[BotCost]:
+    """
+    Returns the cost of the newest version of the same bot that is older than the given version, if any. Versions are
+    ordered by the date in their key, since keys with different timezones don't sort by age.
+    """
+    date = get_version_date(cost.key)
+    if cost.key == cost.bot or date is None:
+        return None
+    older = [(other_date, other) for other, other_date in
+             ((other, get_version_date(other.key)) for other in costs.values() if other.bot == cost.bot)
+             if other_date is not None and other_date < date]
+    return max(older, key=lambda item: item[0])[1] if older else None
+
+
+def print_resource_report(working_dir: WorkingDir, as_json: bool):
+    """
+    Prints every bot ranked by how many cores it uses on average, with the most expensive first. Versions of the same
+    bot are listed separately, and each version shows how its use of cores changed since the previous version.
+    """
+    costs = aggregate_costs(working_dir)
+    ranked = sorted(costs.values(), key=lambda cost: (-cost.cores, -cost.peak_rss_mb, cost.key))
+
+    if not as_json:
+        print(f'{"#":>3}  {"bot":<48}{"matches":>8}{"cores":>7}{"change":>8}{"cpu s":>8}{"peak MB":>9}'
+              f'{"growth MB":>10}{"threads":>8}')
+    for rank, cost in enumerate(ranked):
+        previous = get_previous_version(cost, costs)
+        change = None
+        if previous is not None and previous.cores > 0:
+            change = cost.cores / previous.cores - 1
+
+        if as_json:
+            print(json.dumps({'rank': rank + 1, **cost.__dict__,
+                              'previous_version': previous.key if previous else None, 'change': change}))
+            continue
+
+        change_str = f'{change:+.0%}' if change is not None else ''
+        print(f'{rank + 1:>3}  {cost.key:<48}{cost.matches:>8}{cost.cores:>7.2f}{change_str:>8}{cost.cpu_seconds:>8.0f}'
+              f'{cost.peak_rss_mb:>9.0f}{cost.rss_growth_mb:>10.1f}{cost.peak_threads:>8}')
@@ -0,0 +1,101 @@
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from autoleagueplay.ladder import Ladder
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.paths import WorkingDir
+
+
+# Results of elimination brackets are named after the event with this prefix
+BRACKET_PREFIX = 'bracket'
+
+# A versioned bot key, i.e. the bot name and the date of its version as made by VersionedBot.get_key
+VERSIONED_KEY = r'.+-\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}(\.\d+)?([+-]\d{2}-\d{2})?'
+# The name of a version specific result of a bubble sort, e.g. 'bot1-<version>_vs_bot2-<version>_game2.json'
+VERSION_SPECIFIC_RESULT = re.compile(rf'{VERSIONED_KEY}_vs_{VERSIONED_KEY}(_game\d+)?\.json')
+# The date at the end of a versioned key, with ':' replaced by '-' in the time and the timezone
+VERSION_DATE = re.compile(r'-(\d{4}-\d{2}-\d{2})T(\d{2})-(\d{2})-(\d{2}(\.\d+)?)(([+-]\d{2})-(\d{2}))?$')
+
+
+@dataclass
+class StoredResult:
+    """
+    A match result together with where it was found. Results of league play are named after their division, while
+    results of bubble sorts are named after the versioned bots and have no division.
+    """
+    path: Path
+    division: Optional[str]
+    result: MatchResult
+
+
+def get_result_division(result_name: str) -> Optional[str]:
+    """
+    Returns the name of the division a match result file belongs to, 'bracket' if it is from an elimination bracket,
+    or None if it is a version specific result. Version specific results are recognized by the versions in their name
+    first, since a bot name can start with the name of a division, e.g. 'abacus_bot-<version>_vs_...'.
+    """
+    if VERSION_SPECIFIC_RESULT.fullmatch(result_name):
+        return None
+    prefix = result_name.split('_', 1)[0]
+    return prefix if prefix in Ladder.DIVISION_NAMES or prefix == BRACKET_PREFIX else None
+
+
+def get_version_date(key: str) -> Optional[datetime]:
+    """
+    Returns the date of the version in a versioned key, or None if the key has no version. Dates without a timezone
+    are in local time.
+    """
+    match = VERSION_DATE.search(key)
+    if match is None:
+        return None
+    timezone = f'{match.group(7)}:{match.group(8)}' if match.group(6) else ''
+    date = datetime.fromisoformat(f'{match.group(1)}T{match.group(2)}:{match.group(3)}:{match.group(4)}{timezone}')
+    # Makes dates with and without a timezone comparable
+    return date.astimezone()
+
+
+def get_result_versions(result_name: str, blue: str, orange: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Returns the versioned keys of the blue and orange bot of a version specific match result, based on its file name.
+    Returns None for each bot whose version is unknown, e.g. in league play results.
+    """
+    if get_result_division(result_name) is not None:
+        return None, None
+    keys = re.sub(r'_game\d+$', '', Path(result_name).stem).split('_vs_')
+    versions = []
+    for bot in (blue, orange):
+        prefix = f'{bot.lower()}-'
+        versions.append(next((key for key in keys if key.startswith(prefix)), None))
+    return versions[0], versions[1]
+
+
+def iter_result_paths(working_dir: WorkingDir) -> Iterator[Path]:
+    """
+    Yields the path of every match result in the working directory in a consistent order.
+    """
+    with os.scandir(working_dir.match_results) as entries:
+        names = sorted(entry.name for entry in entries if entry.is_file() and entry.name.endswith('.json'))
+    for name in names:
+        yield working_dir.match_results / name
+
+
+def iter_stored_results(working_dir: WorkingDir) -> Iterator[StoredResult]:
+    """
+    Reads every match result in the working directory. Results are read one at a time, so the full history is never
+    held in memory.
+    """
+    for path in iter_result_paths(working_dir):
+        yield read_stored_result(path)
+
+
+def read_stored_result(path: Path) -> StoredResult:
+    try:
+        result = MatchResult.read(path)
+    except Exception as e:
+        print(f'Error loading result {path.name}. Fix/delete the result and run script again.')
+        raise e
+    return StoredResult(path, get_result_division(path.name), result)
@@ -0,0 +1,164 @@
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from autoleagueplay.match_result import CombinedScore, MatchResult
+from autoleagueplay.result_history import StoredResult
+
+# The stats stored for each side of a match, in the order of the arguments of CombinedScore
+SIDE_STATS = ['goals', 'shots', 'saves', 'points']
+
+
+class ResultTable:
+    """
+    Match results stored column by column. Bot names and groups, e.g. divisions, are interned and stored as ids, and
+    the stats of each side are stored in NumPy arrays, so a season of results takes a few dozen bytes per match
+    instead of a Python object each, and scores are aggregated without a Python loop over the results.
+    The frame pacing of the results is not stored.
+    """
+
+    def __init__(self, bots: List[str], groups: List[Optional[str]], columns: Dict[str, np.ndarray],
+                 replay_ids: List[Optional[str]]):
+        self.bots = bots
+        self.bot_ids = {bot: bot_id for bot_id, bot in enumerate(bots)}
+        self.groups = groups
+        # blue, orange and group are ids, and there is a blue_ and orange_ column of each stat in SIDE_STATS.
+        # timestamp and duration are NaN where they are unknown
+        self.columns = columns
+        self.replay_ids = replay_ids
+
+    def __len__(self) -> int:
+        return len(self.columns['blue'])
+
+    @staticmethod
+    def from_results(results: Iterable[MatchResult]) -> 'ResultTable':
+        builder = ResultTableBuilder()
+        for result in results:
+            builder.add(result)
+        return builder.build()
+
+    @staticmethod
+    def from_stored_results(stored_results: Iterable[StoredResult], default_group: str=None) -> 'ResultTable':
+        """
+        Reads the results into a table grouped by their division, or by default_group for results without one. The
+        results are read one at a time and only their columns are kept.
+        """
+        builder = ResultTableBuilder()
+        for stored in stored_results:
+            builder.add(stored.result, stored.division or default_group)
+        return builder.build()
+
+    def get_result(self, index: int) -> MatchResult:
+        columns = self.columns
+        timestamp = float(columns['timestamp'][index])
+        duration = float(columns['duration'][index])
+        return MatchResult(
+            blue=self.bots[columns['blue'][index]],
+            orange=self.bots[columns['orange'][index]],
+            **{f'{side}_{stat}': int(columns[f'{side}_{stat}'][index])
+               for side in ('blue', 'orange') for stat in SIDE_STATS},
+            replay_id=self.replay_ids[index],
+            timestamp=None if np.isnan(timestamp) else timestamp,
+            shortened=bool(columns['shortened'][index]),
+            poor_pacing=bool(columns['poor_pacing'][index]),
+            duration=None if np.isnan(duration) else duration,
+        )
+
+    def to_results(self) -> List[MatchResult]:
+        return [self.get_result(index) for index in range(len(self))]
+
+    def get_group_mask(self, group: Optional[str]) -> np.ndarray:
+        """
+        Returns which rows belong to the group.
+        """
+        if group not in self.groups:
+            return np.zeros(len(self), dtype=bool)
+        return self.columns['group'] == self.groups.index(group)
+
+    def get_bots(self, mask: np.ndarray=None) -> List[str]:
+        """
+        Returns the bots that played in the selected rows, or in any row, in the order they were first seen.
+        """
+        blue, orange = self.columns['blue'], self.columns['orange']
+        if mask is not None:
+            blue, orange = blue[mask], orange[mask]
+        return [self.bots[bot_id] for bot_id in np.unique(np.concatenate((blue, orange)))]
+
+    def aggregate(self, bots: Iterable[str]=None, mask: np.ndarray=None) -> Dict[str, CombinedScore]:
+        """
+        Returns the combined score of each of the given bots, or of every bot, over the selected rows, or over every
+        row. The scores are the same as those of CombinedScore.calc_score, including for bots that didn't play.
+        """
+        columns = self.columns
+        if mask is not None:
+            columns = {name: column[mask] for name, column in columns.items()}
+        blue, orange = columns['blue'], columns['orange']
+        # Like CombinedScore.add_result, a bot playing itself only gets the stats of blue
+        orange_counts = blue != orange
+        bot_count = len(self.bots)
+
+        def total(blue_values: np.ndarray, orange_values: np.ndarray) -> np.ndarray:
+            return np.bincount(blue, weights=blue_values, minlength=bot_count) + \
+                   np.bincount(orange, weights=orange_values * orange_counts, minlength=bot_count)
+
+        goal_diff = columns['blue_goals'] - columns['orange_goals']
+        totals = [total(goal_diff, -goal_diff)] + \
+                 [total(columns[f'blue_{stat}'], columns[f'orange_{stat}']) for stat in SIDE_STATS]
+
+        scores = {}
+        for bot in (self.bots if bots is None else bots):
+            bot_id = self.bot_ids.get(bot)
+            values = [int(round(column[bot_id])) if bot_id is not None else 0 for column in totals]
+            scores[bot] = CombinedScore(bot, *values)
+        return scores
+
+
+class ResultTableBuilder:
+    """
+    Collects results into compact typed arrays, so a table can be built from a stream of results without holding all
+    of them in memory.
+    """
+
+    def __init__(self):
+        self.bots: List[str] = []
+        self.bot_ids: Dict[str, int] = {}
+        self.groups: List[Optional[str]] = []
+        self.group_ids: Dict[Optional[str], int] = {}
+        self.columns = {'blue': array('i'), 'orange': array('i'), 'group': array('i'),
+                        **{f'{side}_{stat}': array('i') for side in ('blue', 'orange') for stat in SIDE_STATS},
+                        'timestamp': array('d'), 'duration': array('d'), 'shortened': array('b'),
+                        'poor_pacing': array('b')}
+        self.replay_ids: List[Optional[str]] = []
+
+    def get_bot_id(self, bot: str) -> int:
+        if bot not in self.bot_ids:
+            self.bot_ids[bot] = len(self.bots)
+            self.bots.append(bot)
+        return self.bot_ids[bot]
+
+    def get_group_id(self, group: Optional[str]) -> int:
+        if group not in self.group_ids:
+            self.group_ids[group] = len(self.groups)
+            self.groups.append(group)
+        return self.group_ids[group]
+
+    def add(self, result: MatchResult, group: str=None):
+        columns = self.columns
+        columns['blue'].append(self.get_bot_id(result.blue))
+        columns['orange'].append(self.get_bot_id(result.orange))
+        columns['group'].append(self.get_group_id(group))
+        for side in ('blue', 'orange'):
+            for stat in SIDE_STATS:
+                columns[f'{side}_{stat}'].append(getattr(result, f'{side}_{stat}'))
+        columns['timestamp'].append(result.timestamp if result.timestamp is not None else np.nan)
+        columns['duration'].append(result.duration if result.duration is not None else np.nan)
+        columns['shortened'].append(result.shortened)
+        columns['poor_pacing'].append(result.poor_pacing)
+        self.replay_ids.append(result.replay_id)
+
+    def build(self) -> ResultTable:
+        columns = {name: np.frombuffer(column, dtype=column.typecode).copy() for name, column in self.columns.items()}
+        columns['shortened'] = columns['shortened'].astype(bool)
+        columns['poor_pacing'] = columns['poor_pacing'].astype(bool)
+        return ResultTable(self.bots, self.groups, columns, self.replay_ids)
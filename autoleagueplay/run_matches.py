@@ -1,25 +1,273 @@
+import _thread
+import json
+import threading
 import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, List, Optional
 
-from rlbot.setup_manager import setup_manager_context
+from rlbot.matchconfig.match_config import MatchConfig
+from rlbot.setup_manager import SetupManager, setup_manager_context
 from rlbot.training.training import Fail
 from rlbot.utils.logging_utils import get_logger
 from rlbottraining.exercise_runner import run_playlist
 
 from autoleagueplay.fake_renderer import FakeRenderer
-from autoleagueplay.generate_matches import generate_round_robin_matches
+from autoleagueplay.footprints import BotProcessMonitor
+from autoleagueplay.frame_pacing import PacingPolicy
+from autoleagueplay.generate_matches import generate_round_robin_matches, order_for_bot_reuse
 from autoleagueplay.ladder import Ladder
+from autoleagueplay.ladder_history import LadderHistory
 from autoleagueplay.load_bots import load_all_bots
 from autoleagueplay.match_configurations import make_match_config
-from autoleagueplay.match_exercise import MatchExercise, MatchGrader
+from autoleagueplay.match_exercise import FailDueToStall, FailDueToTimeLimit, MatchExercise, MatchGrader, MercyRule
 from autoleagueplay.match_result import CombinedScore, MatchResult
 from autoleagueplay.overlay import OverlayData
 from autoleagueplay.paths import WorkingDir
 from autoleagueplay.replays import ReplayPreference, ReplayMonitor
+from autoleagueplay.resource_usage import BotResourceUsage, write_resource_usage
+from autoleagueplay.result_table import ResultTable
+from autoleagueplay.scheduler import MatchJob, MatchScheduler, ResourceBudget
+from autoleagueplay.standings import LiveStandings
 
 logger = get_logger('autoleagueplay')
 
+# Seconds after the time limit before the hard time limit interrupts a match that the grader could not fail
+HARD_LIMIT_GRACE = 60
+
+
+class MatchStalled(Exception):
+    """
+    Raised when a match stops making progress and has to be torn down.
+    """
+    pass
+
+
+class HardTimeLimit:
+    """
+    Context manager that raises MatchStalled in the main thread if the block takes longer than the time limit. The
+    grader enforces the time limit of the match itself, so this is a backstop for hangs outside of it, e.g. a bot that
+    never finishes loading. It interrupts the main thread, which does not work while the main thread is blocked in a
+    call that doesn't return to Python. It does nothing outside of the main thread.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expired = False
+        self._timer = None
+        self._lock = threading.Lock()
+        self._done = False
+
+    def _expire(self):
+        with self._lock:
+            if self._done:
+                return
+            self.expired = True
+            _thread.interrupt_main()
+
+    def __enter__(self) -> 'HardTimeLimit':
+        if threading.current_thread() is threading.main_thread():
+            self._timer = threading.Timer(self.seconds, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._lock:
+            self._done = True
+        if self._timer is not None:
+            self._timer.cancel()
+        if not self.expired:
+            return
+        if exc_type is KeyboardInterrupt:
+            raise MatchStalled(f'The match took longer than the limit of {self.seconds:.0f} seconds.')
+        # The limit ran out just as the block finished, so the interrupt is still on its way. It is caught here, so it
+        # can't stop the rest of the run
+        try:
+            time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+class MatchRunner:
+    """
+    Plays matches one at a time. With reuse_bot_processes, all matches are played in the same RLBot session and a bot
+    that plays in the same slot as in the previous match keeps its process, which skips starting the process and
+    importing the bot. RLBot reloads the agent of every bot before each match, so bots still start each game in a fresh
+    state, and the agent's own initialization is not skipped.
+    If a mercy rule is given, matches are ended as soon as the rule finds them decided.
+    A match stalls if its game time stops progressing for stall_timeout seconds or it takes more than time_limit
+    seconds in total. A stalled match is torn down and retried up to max_attempts times in total, and each recovery is
+    appended to the recovery log.
+    If a pacing policy is given, matches where the game ran too unevenly are flagged, and played again if the policy
+    says so. A match that is still poor after max_attempts keeps the last result.
+    The bot processes are pinned to the given cores, if any. With sample_resources, the resource usage of the bots in
+    the latest match is kept in last_usage. The bot processes are only watched if they are pinned or sampled.
+    """
+
+    def __init__(self, reuse_bot_processes: bool=False, mercy_rule: MercyRule=None, stall_timeout: float=60,
+                 time_limit: float=30 * 60, max_attempts: int=3, recovery_log: Path=None, cores: List[int]=None,
+                 pacing_policy: PacingPolicy=None, sample_resources: bool=False):
+        self.reuse_bot_processes = reuse_bot_processes
+        self.mercy_rule = mercy_rule
+        self.stall_timeout = stall_timeout
+        self.time_limit = time_limit
+        self.max_attempts = max_attempts
+        self.recovery_log = recovery_log
+        self.cores = cores
+        self.pacing_policy = pacing_policy
+        self.sample_resources = sample_resources
+        self.last_usage: Dict[str, BotResourceUsage] = {}
+        self.setup_manager: Optional[SetupManager] = None
+        self._exit_stack = ExitStack()
+
+    def __enter__(self) -> 'MatchRunner':
+        if self.reuse_bot_processes:
+            self.setup_manager = self._exit_stack.enter_context(setup_manager_context())
+            # Disable rendering by replacing renderer with a renderer that does nothing
+            self.setup_manager.game_interface.renderer = FakeRenderer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.setup_manager = None
+        return self._exit_stack.__exit__(exc_type, exc_value, traceback)
+
+    def run_match(self, participant_1: str, participant_2: str, match_config,
+                  replay_preference) -> Optional[MatchResult]:
+        """
+        Plays the match and returns the result, or None if every attempt at playing it stalled.
+        """
+        self.last_usage = {}
+        start_time = time.time()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                # The grader fails the match at the deadline. The hard limit only catches hangs outside of the grader
+                deadline = time.time() + self.time_limit
+                with HardTimeLimit(self.time_limit + HARD_LIMIT_GRACE):
+                    result = self._run_match_once(participant_1, participant_2, match_config, replay_preference,
+                                                  deadline)
+            except MatchStalled as e:
+                print(f'WARNING: The match \'{participant_1} vs {participant_2}\' stalled: {e}')
+                self._record_recovery(participant_1, participant_2, attempt, str(e))
+                self._tear_down()
+                continue
+
+            if result is not None and self.pacing_policy is not None and self.pacing_policy.is_poor(result):
+                result.poor_pacing = True
+                reason = f'Poor frame pacing: {result.frame_pacing}'
+                print(f'WARNING: The game ran unevenly during \'{participant_1} vs {participant_2}\'. {reason}')
+                if self.pacing_policy.replay_poor_matches and attempt < self.max_attempts:
+                    self._record_recovery(participant_1, participant_2, attempt, reason)
+                    continue
+            if result is not None:
+                result.duration = time.time() - start_time
+            return result
+
+        print(f'WARNING: Giving up on the match \'{participant_1} vs {participant_2}\' after {self.max_attempts} attempts')
+        return None
+
+    def _run_match_once(self, participant_1: str, participant_2: str, match_config,
+                        replay_preference, deadline: float) -> MatchResult:
+        if self.setup_manager is None:
+            with setup_manager_context() as setup_manager:
+                # Disable rendering by replacing renderer with a renderer that does nothing
+                setup_manager.game_interface.renderer = FakeRenderer()
+                return self._play_monitored(setup_manager, participant_1, participant_2, match_config,
+                                            replay_preference, deadline)
+
+        if self.setup_manager.match_config is not None:
+            self._setup_match_keeping_bots(match_config)
+        return self._play_monitored(self.setup_manager, participant_1, participant_2, match_config, replay_preference,
+                                    deadline)
+
+    def _play_monitored(self, setup_manager: SetupManager, participant_1: str, participant_2: str, match_config,
+                        replay_preference, deadline: float) -> MatchResult:
+        if self.cores is None and not self.sample_resources:
+            return play_match(setup_manager, participant_1, participant_2, match_config, replay_preference,
+                              self.mercy_rule, self.stall_timeout, deadline)
+        with BotProcessMonitor(setup_manager, self.cores) as monitor:
+            result = play_match(setup_manager, participant_1, participant_2, match_config, replay_preference,
+                                self.mercy_rule, self.stall_timeout, deadline)
+        if self.sample_resources:
+            self.last_usage = monitor.get_usage()
+        return result
+
+    def _tear_down(self):
+        """
+        Stops all bots after a stall, so the next attempt starts from scratch.
+        """
+        if self.setup_manager is not None:
+            self.setup_manager.shut_down(kill_all_pids=True, quiet=True)
+            # Forget the match, so it is set up again even if the next match config is the same
+            self.setup_manager.match_config = None
+
+    def _record_recovery(self, participant_1: str, participant_2: str, attempt: int, reason: str):
+        if self.recovery_log is None:
+            return
+        with open(self.recovery_log, 'a') as f:
+            f.write(json.dumps({
+                'time': time.time(),
+                'blue': participant_1,
+                'orange': participant_2,
+                'attempt': attempt,
+                'reason': reason,
+            }) + '\n')
+
+    def _setup_match_keeping_bots(self, match_config: MatchConfig):
+        """
+        Starts the given match while keeping the processes of bots that play in the same slot as before. If no bots can
+        be kept, nothing happens and the match is set up from scratch by run_playlist.
+        This works on the internals of the SetupManager of RLBot 1.68: the bot_processes, agent_metadata_map,
+        bot_quit_callbacks and bot_reload_requests it keeps for each bot, and the arguments run_agent is started with.
+        The savings are partial. The exercise still calls reload_all_agents before each match, which makes a new agent
+        in every kept process, so only starting the process and importing the bot is skipped.
+        """
+        setup_manager = self.setup_manager
+        kept_count = 0
+        kept_events = []
+        for index, process_info in list(setup_manager.bot_processes.items()):
+            old_player = process_info.player_config
+            new_player = match_config.player_configs[index] if index < len(match_config.player_configs) else None
+            if new_player is not None and process_info.is_alive() \
+                    and new_player.config_path == old_player.config_path and new_player.team == old_player.team:
+                # The bot process recognizes its car by the spawn id, so the car must keep it
+                new_player.spawn_id = old_player.spawn_id
+                kept_count += 1
+                if process_info.process is not None:
+                    # run_agent is started with the quit event, the quit callback and the reload request, in that order
+                    kept_events.append(process_info.process._args[1:3])
+            else:
+                (process_info.process or process_info.subprocess).terminate()
+                del setup_manager.bot_processes[index]
+                # Otherwise shut_down would kill the pids of the old bot again, even if they now belong to another
+                setup_manager.agent_metadata_map.pop(index, None)
+
+        # Otherwise shut_down waits for the quit callbacks of terminated bots, and reloads are requested of them
+        setup_manager.bot_quit_callbacks = [quit_callback for quit_callback, _ in kept_events]
+        setup_manager.bot_reload_requests = [reload_request for _, reload_request in kept_events]
+
+        if kept_count == 0:
+            return
+
+        print(f'Reusing {kept_count} bot process(es) from the previous match')
+        # Only the new processes will report their metadata
+        setup_manager.num_metadata_received = kept_count
+        setup_manager.load_match_config(match_config)
+        setup_manager.start_match()
+        setup_manager.launch_bot_processes()
+        while not setup_manager.has_received_metadata_from_all_bots():
+            setup_manager.try_recieve_agent_metadata()
+            time.sleep(0.1)
+
 
 def run_match(participant_1: str, participant_2: str, match_config, replay_preference) -> MatchResult:
+    with MatchRunner() as match_runner:
+        return match_runner.run_match(participant_1, participant_2, match_config, replay_preference)
+
+
+def play_match(setup_manager: SetupManager, participant_1: str, participant_2: str, match_config,
+               replay_preference, mercy_rule: MercyRule=None, stall_timeout: float=60,
+               deadline: float=None) -> MatchResult:
 
     # Play the match
     print(f'Starting match: {participant_1} vs {participant_2}. Waiting for match to finish...')
@@ -28,31 +276,49 @@ def run_match(participant_1: str, participant_2: str, match_config, replay_prefe
         match_config=match_config,
         grader=MatchGrader(
             replay_monitor=ReplayMonitor(replay_preference=replay_preference),
+            mercy_rule=mercy_rule,
+            game_interface=setup_manager.game_interface,
+            stall_timeout=stall_timeout,
+            deadline=deadline,
         )
     )
 
-    with setup_manager_context() as setup_manager:
-        # Disable rendering by replacing renderer with a renderer that does nothing
-        setup_manager.game_interface.renderer = FakeRenderer()
+    # For loop, but should only run exactly once
+    for exercise_result in run_playlist([match], setup_manager=setup_manager):
 
-        # For loop, but should only run exactly once
-        for exercise_result in run_playlist([match], setup_manager=setup_manager):
+        # A match that stalled or ran out of time after it ended still has a result
+        if isinstance(exercise_result.grade, (FailDueToStall, FailDueToTimeLimit)) and \
+                exercise_result.exercise.grader.match_result is None:
+            raise MatchStalled(repr(exercise_result.grade))
 
-            # Warn users if no replay was found
-            if isinstance(exercise_result.grade, Fail) and exercise_result.exercise.grader.replay_monitor.replay_id == None:
-                print(f'WARNING: No replay was found for the match \'{participant_1} vs {participant_2}\'. Is Bakkesmod injected and \'Automatically save all replays\' enabled?')
+        # Warn users if no replay was found
+        if isinstance(exercise_result.grade, Fail) and exercise_result.exercise.grader.replay_monitor.replay_id == None:
+            print(f'WARNING: No replay was found for the match \'{participant_1} vs {participant_2}\'. Is Bakkesmod injected and \'Automatically save all replays\' enabled?')
 
-            # Save result in file
-            return exercise_result.exercise.grader.match_result
+        # Save result in file
+        result = exercise_result.exercise.grader.match_result
+        if result is not None:
+            result.replay_id = exercise_result.exercise.grader.replay_monitor.replay_id
+        return result
 
 
-def run_league_play(working_dir: WorkingDir, odd_week: bool, replay_preference: ReplayPreference, team_size):
+def run_league_play(working_dir: WorkingDir, odd_week: bool, replay_preference: ReplayPreference, team_size,
+                    reuse_bot_processes: bool=False, mercy_rule: MercyRule=None, stall_timeout: float=60,
+                    time_limit: float=30 * 60, budget: ResourceBudget=None, sample_resources: bool=False,
+                    pacing_policy: PacingPolicy=None):
     """
     Run a league play event by running round robins for half the divisions. When done, a new ladder file is created.
+    With sample_resources, the resource usage of the bots is stored next to each result.
     """
 
     bots = load_all_bots(working_dir)
     ladder = Ladder.read(working_dir.ladder)
+    ladder_history = LadderHistory(working_dir.ladder_history)
+    ladder_history.record(ladder)
+    budget = budget or ResourceBudget()
+    live_standings = LiveStandings(ladder)
+    # The overlay of the match that started last, which is written again when the standings change
+    current_overlay: List[OverlayData] = []
 
     # We need the result of every match to create the next ladder. For each match in each round robin, if a result
     # exist already, it will be parsed, if it doesn't exist, it will be played.
@@ -64,67 +330,122 @@ def run_league_play(working_dir: WorkingDir, odd_week: bool, replay_preference:
     # If there is only one division always play that division (division 0, quantum).
     playing_division_indices = range(ladder.division_count())[int(odd_week) % 2::2] if ladder.division_count() > 1 else [0]
 
-    # The divisions play in reverse order, so quantum/overclocked division plays last
-    for div_index in playing_division_indices[::-1]:
-        print(f'Starting round robin for the {Ladder.DIVISION_NAMES[div_index]} division')
+    # Bots that play several matches in a row can keep their process if enabled
+    previous_match = None
+    missing_results = False
+    with MatchRunner(reuse_bot_processes, mercy_rule, stall_timeout, time_limit,
+                     recovery_log=working_dir.match_recoveries, cores=budget.cores,
+                     pacing_policy=pacing_policy, sample_resources=sample_resources) as match_runner:
+        scheduler = MatchScheduler(match_runner, replay_preference)
 
-        rr_bots = ladder.round_robin_participants(div_index)
-        rr_matches = generate_round_robin_matches(rr_bots)
-        rr_results = []
+        # The divisions play in reverse order, so quantum/overclocked division plays last
+        for div_index in playing_division_indices[::-1]:
+            print(f'Starting round robin for the {Ladder.DIVISION_NAMES[div_index]} division')
 
-        for match_participants in rr_matches:
+            rr_bots = ladder.round_robin_participants(div_index)
+            rr_matches = generate_round_robin_matches(rr_bots)
+            rr_results = []
+            live_standings.start_division(div_index, rr_bots)
 
-            # Check if match has already been play, i.e. the result file already exist
-            result_path = working_dir.get_match_result(div_index, match_participants[0], match_participants[1])
-            if result_path.exists():
-                # Found existing result
-                try:
-                    print(f'Found existing result {result_path.name}')
-                    result = MatchResult.read(result_path)
+            unplayed = []
+            for match_participants in rr_matches:
 
-                    rr_results.append(result)
+                # Check if match has already been play, i.e. the result file already exist
+                result_path = working_dir.get_match_result(div_index, match_participants[0], match_participants[1])
+                if result_path.exists():
+                    # Found existing result
+                    try:
+                        print(f'Found existing result {result_path.name}')
+                        result = MatchResult.read(result_path)
 
-                except Exception as e:
-                    print(f'Error loading result {result_path.name}. Fix/delete the result and run script again.')
-                    raise e
+                        rr_results.append(result)
+                        live_standings.add_result(div_index, result)
 
-            else:
+                    except Exception as e:
+                        print(f'Error loading result {result_path.name}. Fix/delete the result and run script again.')
+                        raise e
+
+                else:
+                    unplayed.append(match_participants)
+            live_standings.write(working_dir.live_standings)
+
+            if reuse_bot_processes:
+                # Play the missing matches in an order that lets bots keep their process between matches. The results
+                # do not depend on the order
+                unplayed = order_for_bot_reuse(unplayed, previous_match)
+                previous_match = unplayed[-1] if unplayed else previous_match
+
+            jobs = [
+                MatchJob(
+                    blue=bots[match_participants[0]].name,
+                    orange=bots[match_participants[1]].name,
+                    match_config=make_match_config(bots[match_participants[0]], bots[match_participants[1]], team_size),
+                    result_path=working_dir.get_match_result(div_index, match_participants[0], match_participants[1]),
+                    team_size=team_size,
+                )
+                for match_participants in unplayed
+            ]
+
+            def on_start(job: MatchJob):
                 # Let overlay know which match we are about to start
-                overlay_data = OverlayData(div_index, bots[match_participants[0]].config_path, bots[match_participants[1]].config_path)
+                blue_config, orange_config = job.match_config.player_configs[:2]
+                overlay_data = OverlayData(div_index, blue_config.config_path, orange_config.config_path,
+                                           live_standings.to_dict())
                 overlay_data.write(working_dir.overlay_interface)
+                current_overlay[:] = [overlay_data]
 
-                participant_1 = bots[match_participants[0]]
-                participant_2 = bots[match_participants[1]]
-                match_config = make_match_config(participant_1, participant_2, team_size)
-                result = run_match(participant_1.name, participant_2.name, match_config, replay_preference)
-                result.write(result_path)
-                print(f'Match finished {result.blue_goals}-{result.orange_goals}. Saved result as {result_path}')
+            for job, result, usage in scheduler.run(jobs, on_start):
+                if result is None:
+                    # Keep going. The match is played the next time the script runs
+                    print(f'Skipping {job.result_path.name}. The new ladder will not be made until it is played.')
+                    missing_results = True
+                    continue
+                result.write(job.result_path)
+                if sample_resources:
+                    write_resource_usage(working_dir.get_resource_usage(job.result_path), result, usage)
+                notes_str = ' (ended early)' if result.shortened else ''
+                notes_str += ' (poor frame pacing)' if result.poor_pacing else ''
+                print(f'Match finished {result.blue_goals}-{result.orange_goals}{notes_str}. Saved result as {job.result_path}')
 
                 rr_results.append(result)
+                live_standings.add_result(div_index, result)
+                live_standings.write(working_dir.live_standings)
+                for overlay_data in current_overlay:
+                    overlay_data.standings = live_standings.to_dict()
+                    overlay_data.write(working_dir.overlay_interface)
 
                 # Let the winner celebrate and the scoreboard show for a few seconds.
                 # This sleep not required.
                 time.sleep(8)
 
-        print(f'{Ladder.DIVISION_NAMES[div_index]} division done')
-        event_results.append(rr_results)
-
-        # Find bots' overall score for the round robin
-        overall_scores = [CombinedScore.calc_score(bot, rr_results) for bot in rr_bots]
-        sorted_overall_scores = sorted(overall_scores)[::-1]
-        print(f'Bots\' overall performance in {Ladder.DIVISION_NAMES[div_index]} division:')
-        for score in sorted_overall_scores:
-            print(f'> {score.bot}: goal_diff={score.goal_diff}, goals={score.goals}, shots={score.shots}, saves={score.saves}, points={score.points}')
-
-        # Rearrange bots in division on the new ladder
-        first_bot_index = new_ladder.division_size * div_index
-        bots_to_rearrange = len(rr_bots)
-        for i in range(bots_to_rearrange):
-            new_ladder.bots[first_bot_index + i] = sorted_overall_scores[i].bot
-
-    # Save new ladder
-    Ladder.write(new_ladder, working_dir.new_ladder)
-    print(f'Done. Saved new ladder as {working_dir.new_ladder.name}')
+            print(f'{Ladder.DIVISION_NAMES[div_index]} division done')
+            event_results.append(rr_results)
+
+            # Find bots' overall score for the round robin
+            overall_scores = ResultTable.from_results(rr_results).aggregate(rr_bots).values()
+            # Ranked like the live standings, so the new ladder is the last provisional ladder
+            sorted_overall_scores = sorted(overall_scores, key=CombinedScore.ranking_key)
+            print(f'Bots\' overall performance in {Ladder.DIVISION_NAMES[div_index]} division:')
+            for score in sorted_overall_scores:
+                print(f'> {score.bot}: goal_diff={score.goal_diff}, goals={score.goals}, shots={score.shots}, saves={score.saves}, points={score.points}')
+
+            # Rearrange bots in division on the new ladder
+            first_bot_index = new_ladder.division_size * div_index
+            bots_to_rearrange = len(rr_bots)
+            for i in range(bots_to_rearrange):
+                new_ladder.bots[first_bot_index + i] = sorted_overall_scores[i].bot
+
+    live_standings.complete = not missing_results
+    live_standings.write(working_dir.live_standings)
+
+    if missing_results:
+        print('Some matches could not be played. Run the script again to play them and make the new ladder.')
+        new_ladder = None
+    else:
+        # Save new ladder
+        Ladder.write(new_ladder, working_dir.new_ladder)
+        ladder_history.record(new_ladder, label=working_dir.new_ladder.name)
+        print(f'Done. Saved new ladder as {working_dir.new_ladder.name}')
 
     # Remove overlay interface file now that we are done
     if working_dir.overlay_interface.exists():
@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import psutil
+
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.resource_usage import BotResourceUsage
+
+
+@dataclass
+class ResourceBudget:
+    """
+    The resources the bots may use. cores are the indices of the cores bots are pinned to, or None to let bots use any
+    core.
+    """
+
+    cores: Optional[List[int]] = None
+
+    @staticmethod
+    def from_core_count(core_count: Optional[int]) -> 'ResourceBudget':
+        """
+        Returns a budget with the given number of cores. The highest cores are used for the bots, which leaves the
+        lowest cores for the game and the rest of the system.
+        """
+        if core_count is None:
+            return ResourceBudget(None)
+        cpu_count = psutil.cpu_count()
+        core_count = max(1, min(core_count, cpu_count))
+        return ResourceBudget(list(range(cpu_count - core_count, cpu_count)))
+
+
+@dataclass
+class MatchJob:
+    """
+    A match that can be played independently of the other matches being scheduled.
+    """
+
+    blue: str
+    orange: str
+    match_config: object
+    result_path: Path
+    team_size: int = 1
+
+
+# A finished match, with the resource usage of its bots by name
+ScheduledResult = Tuple[MatchJob, Optional[MatchResult], Dict[str, BotResourceUsage]]
+
+
+class MatchScheduler:
+    """
+    Plays independent matches with the match runner. RLBot drives a single Rocket League on each host, so the matches
+    are played one at a time in the given order.
+    """
+
+    def __init__(self, match_runner, replay_preference):
+        self.match_runner = match_runner
+        self.replay_preference = replay_preference
+
+    def run(self, jobs: List[MatchJob], on_start: Callable[[MatchJob], None]=None) -> Iterator[ScheduledResult]:
+        """
+        Plays the matches and yields each job with its result and the resource usage of its bots as the matches finish.
+        The result is None if the match could not be played.
+        """
+        for job in jobs:
+            if on_start is not None:
+                on_start(job)
+            result = self.match_runner.run_match(job.blue, job.orange, job.match_config, self.replay_preference)
+            yield job, result, self.match_runner.last_usage
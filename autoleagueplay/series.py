@@ -0,0 +1,62 @@
+import math
+from dataclasses import dataclass
+from typing import List, Optional
+
+from autoleagueplay.match_result import MatchResult
+
+
+@dataclass
+class SeriesPolicy:
+    """
+    Decides how many games are played when comparing two bots. Up to max_games are played, but the series stops as
+    soon as a sequential probability ratio test (SPRT) on the goal differentials is confident about the better bot.
+    Lopsided pairings are therefore settled after one game, while close pairings get more games.
+    The test assumes goal differentials are normally distributed with the given standard deviation, and compares the
+    hypotheses that one or the other bot is better by goal_diff_effect goals per game.
+    """
+
+    max_games: int = 1
+    confidence: float = 0.95
+    goal_diff_effect: float = 1.5
+    goal_diff_stddev: float = 2.0
+
+    def log_likelihood_ratio(self, goal_diffs: List[int]) -> float:
+        """
+        Returns the log likelihood ratio of the first bot being better versus the second bot being better.
+        """
+        return 2 * self.goal_diff_effect / self.goal_diff_stddev ** 2 * sum(goal_diffs)
+
+    def threshold(self) -> float:
+        # Same error rate in both directions, so the bounds of the test are symmetric
+        error_rate = 1 - self.confidence
+        return math.log((1 - error_rate) / error_rate)
+
+    def is_decided(self, goal_diffs: List[int]) -> bool:
+        if len(goal_diffs) == 0:
+            return False
+        if len(goal_diffs) >= self.max_games:
+            return True
+        return abs(self.log_likelihood_ratio(goal_diffs)) >= self.threshold()
+
+
+def get_goal_diff(bot: str, result: MatchResult) -> int:
+    """
+    Returns the goal differential of the given bot in the match. The bot is the lowercase bot name.
+    """
+    if result.blue.lower() == bot:
+        return result.blue_goals - result.orange_goals
+    return result.orange_goals - result.blue_goals
+
+
+def get_series_winner(upper_bot: str, lower_bot: str, results: List[MatchResult]) -> Optional[str]:
+    """
+    Returns the winner of a series between two bots or None if no games were played. The bot with the best total goal
+    differential wins, and the upper bot keeps its place if they are equal. This is the tie-break of a single game in
+    the bubble sort: the lower bot plays blue and the upper bot orange, and a tied game has orange as both the winner
+    and the loser of its MatchResult, so the bots were never swapped.
+    """
+    if len(results) == 0:
+        return None
+    goal_diff = sum(get_goal_diff(lower_bot, result) for result in results)
+    # A tie is not a win for the challenger
+    return lower_bot if goal_diff > 0 else upper_bot
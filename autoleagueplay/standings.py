@@ -0,0 +1,110 @@
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from autoleagueplay.ladder import Ladder
+from autoleagueplay.match_result import CombinedScore, MatchResult
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.result_history import BRACKET_PREFIX, StoredResult, iter_stored_results
+from autoleagueplay.result_table import ResultTable
+
+# Results that are not named after a division, i.e. the version specific results of bubble sorts, are grouped here
+BUBBLE_GROUP = 'bubble'
+
+
+def aggregate_standings(stored_results: Iterable[StoredResult]) -> Dict[str, Dict[str, CombinedScore]]:
+    """
+    Combines the scores of every bot in every division. The results are read once into a result table, and the scores
+    of each division are aggregated from its columns.
+    Returns a dict mapping division name to a dict mapping bot name to the bot's combined score.
+    """
+    table = ResultTable.from_stored_results(stored_results, BUBBLE_GROUP)
+    standings = {}
+    for group in table.groups:
+        mask = table.get_group_mask(group)
+        standings[group] = table.aggregate(table.get_bots(mask), mask)
+    return standings
+
+
+def sorted_standings(scores: Dict[str, CombinedScore]) -> List[CombinedScore]:
+    """
+    Returns the scores sorted best first. Ties are broken by name, so the order is the same every time.
+    """
+    return sorted(scores.values(), key=CombinedScore.ranking_key)
+
+
+class LiveStandings:
+    """
+    The standings of the round robins of a league play event, kept up to date as each result arrives. A result only
+    changes the scores of its two bots, so adding it takes constant time. The provisional ladder is the ladder the
+    event would end with if the round robins stopped now. It is ranked like the final ladder, so once every result is
+    in, it is the new ladder.
+    """
+
+    def __init__(self, ladder: Ladder):
+        self.ladder = ladder
+        # The scores of each playing division by bot, in the order the divisions started
+        self.divisions: Dict[int, Dict[str, CombinedScore]] = {}
+        self.complete = False
+
+    def start_division(self, div_index: int, rr_bots: List[str]):
+        self.divisions[div_index] = {bot: CombinedScore(bot, 0, 0, 0, 0, 0) for bot in rr_bots}
+
+    def add_result(self, div_index: int, result: MatchResult):
+        scores = self.divisions[div_index]
+        for bot in (result.blue, result.orange):
+            if bot in scores:
+                scores[bot].add_result(result)
+
+    def ranked(self, div_index: int) -> List[CombinedScore]:
+        return sorted_standings(self.divisions[div_index])
+
+    def get_provisional_ladder(self) -> Ladder:
+        new_ladder = Ladder(list(self.ladder.bots))
+        for div_index in self.divisions:
+            first_bot_index = new_ladder.division_size * div_index
+            for i, score in enumerate(self.ranked(div_index)):
+                new_ladder.bots[first_bot_index + i] = score.bot
+        return new_ladder
+
+    def to_dict(self) -> dict:
+        return {
+            'complete': self.complete,
+            'ladder': self.get_provisional_ladder().bots,
+            'divisions': {
+                Ladder.DIVISION_NAMES[div_index]: [
+                    {'rank': rank + 1, **score.__dict__} for rank, score in enumerate(self.ranked(div_index))
+                ]
+                for div_index in self.divisions
+            },
+        }
+
+    def write(self, path: Path):
+        # Replaced in one step, so an overlay reading the file never sees it half written
+        temp_path = path.with_name(path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+        temp_path.replace(path)
+
+
+def print_standings(working_dir: WorkingDir, as_json: bool):
+    """
+    Prints the standings of every division based on all results found in the working directory.
+    With as_json, each bot's standing is printed as a separate line of JSON instead of a table.
+    """
+    standings = aggregate_standings(iter_stored_results(working_dir))
+
+    group_order = Ladder.DIVISION_NAMES + [BRACKET_PREFIX, BUBBLE_GROUP]
+    for group in sorted(standings.keys(), key=group_order.index):
+        ranked_scores = sorted_standings(standings[group])
+
+        if as_json:
+            for rank, score in enumerate(ranked_scores):
+                print(json.dumps({'division': group, 'rank': rank + 1, **score.__dict__}))
+            continue
+
+        print(f'--- {group} division ---')
+        print(f'{"#":>3}  {"bot":<32}{"goal_diff":>10}{"goals":>7}{"shots":>7}{"saves":>7}{"points":>8}')
+        for rank, score in enumerate(ranked_scores):
+            print(f'{rank + 1:>3}  {score.bot:<32}{score.goal_diff:>10}{score.goals:>7}{score.shots:>7}'
+                  f'{score.saves:>7}{score.points:>8}')
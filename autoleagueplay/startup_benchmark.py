@@ -0,0 +1,90 @@
+"""Startup benchmark
+
+Measures how long the commands that only look at results take to run on an empty league, and checks that they don't
+import rlbot or the other heavy dependencies. Exits with a non-zero status if a command is over the budget, so it can
+be used in CI. Run it with `python -m autoleagueplay.startup_benchmark`.
+
+Usage:
+    startup_benchmark [--budget=S] [--runs=N]
+
+Options:
+    --budget=S                   Maximum median run time of each command in seconds. [default: 0.3]
+    --runs=N                     How many times each command is run. [default: 5]
+"""
+
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from docopt import docopt
+
+# Modules that must not be imported by the query commands
+HEAVY_MODULES = ['rlbot', 'rlbottraining', 'googleapiclient', 'google_auth_oauthlib', 'watchdog', 'requests']
+
+QUERY_COMMANDS = [
+    ['--version'],
+    ['odd', '{ladder}', '--list'],
+    ['even', '{ladder}', '--results'],
+    ['standings', '{ladder}'],
+    ['standings', '{ladder}', '--json'],
+    ['history', '{ladder}'],
+    ['resources', '{ladder}'],
+    ['plan', 'even', '{ladder}'],
+]
+
+RUN_COMMAND_SCRIPT = f'''
+import sys
+from autoleagueplay.__main__ import main
+sys.argv = ['autoleagueplay'] + sys.argv[1:]
+try:
+    main()
+except SystemExit:
+    pass
+heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+if heavy:
+    sys.exit('Imported ' + ', '.join(heavy))
+'''
+
+
+def time_command(args: List[str]) -> float:
+    """
+    Runs the command in a fresh interpreter and returns the wall-clock time it took in seconds.
+    """
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', RUN_COMMAND_SCRIPT] + args, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+    duration = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f'\'autoleagueplay {" ".join(args)}\' failed: {process.stderr.strip()}')
+    return duration
+
+
+def main():
+    arguments = docopt(__doc__)
+    budget = float(arguments['--budget'])
+    runs = int(arguments['--runs'])
+
+    with tempfile.TemporaryDirectory() as league_dir:
+        ladder_path = Path(league_dir) / 'ladder.txt'
+        ladder_path.write_text('\n'.join(f'bot{i}' for i in range(20)) + '\n')
+
+        over_budget = False
+        for command in QUERY_COMMANDS:
+            args = [arg.format(ladder=ladder_path) for arg in command]
+            durations = [time_command(args) for _ in range(runs)]
+            median = statistics.median(durations)
+            status = 'ok' if median <= budget else 'OVER BUDGET'
+            print(f'{" ".join(command):<32} median={median:.3f}s  max={max(durations):.3f}s  {status}')
+            over_budget |= median > budget
+
+    if over_budget:
+        print(f'Some commands are slower than the budget of {budget}s')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
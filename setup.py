@@ -23,6 +23,9 @@ setuptools.setup(
         'rlbot',
         'rlbottraining>=0.3.0',
         'docopt',
+        'psutil',
+        'numpy',
+        'Pillow',
         'requests',
         'watchdog',
         'google-api-python-client',
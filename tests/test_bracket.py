@@ -0,0 +1,98 @@
+import random
+from collections import Counter
+
+from autoleagueplay.bracket import Bracket, BracketMatch, seed_order
+
+
+def play_out(bracket: Bracket, pick_winner):
+    """
+    Plays the bracket to the end, deciding each match with pick_winner. Returns the final outcomes and the played
+    matches in the order they were played.
+    """
+    winners = {}
+    played = []
+
+    def get_winner(match: BracketMatch, blue: str, orange: str):
+        return winners.get(match.match_id)
+
+    outcomes = bracket.resolve(get_winner)
+    while bracket.get_champion(outcomes) is None:
+        ready = bracket.get_ready_matches(outcomes)
+        assert ready, 'The bracket is stuck'
+        wave_bots = [bot for match in ready for bot in (outcomes[match.match_id].blue, outcomes[match.match_id].orange)]
+        assert len(wave_bots) == len(set(wave_bots)), 'A bot plays twice in the same wave'
+        for match in ready:
+            outcome = outcomes[match.match_id]
+            winners[match.match_id] = pick_winner(match, outcome.blue, outcome.orange)
+            played.append((match.match_id, outcome.blue, outcome.orange))
+        outcomes = bracket.resolve(get_winner)
+    return outcomes, played
+
+
+def better_seed_wins(seeds):
+    return lambda match, blue, orange: min(blue, orange, key=seeds.index)
+
+
+def test_seed_order_keeps_the_best_seeds_apart():
+    assert seed_order(2) == [0, 1]
+    assert seed_order(4) == [0, 3, 1, 2]
+    assert seed_order(8) == [0, 7, 3, 4, 1, 6, 2, 5]
+
+
+def test_single_elimination_is_won_by_the_best_seed():
+    seeds = ['a', 'b', 'c', 'd']
+    bracket = Bracket(seeds, double_elimination=False)
+    outcomes, played = play_out(bracket, better_seed_wins(seeds))
+    assert bracket.get_champion(outcomes) == 'a'
+    assert played == [('W1-1', 'a', 'd'), ('W1-2', 'b', 'c'), ('W2-1', 'a', 'b')]
+
+
+def test_best_seeds_get_the_byes():
+    seeds = ['a', 'b', 'c']
+    bracket = Bracket(seeds, double_elimination=False)
+    outcomes, played = play_out(bracket, better_seed_wins(seeds))
+    # The bye is decided without being played
+    assert outcomes['W1-1'].winner == 'a' and outcomes['W1-1'].orange is None
+    assert [match_id for match_id, _, _ in played] == ['W1-2', 'W2-1']
+    assert bracket.get_champion(outcomes) == 'a'
+
+
+def test_winners_bracket_champion_winning_the_grand_final_skips_the_reset():
+    seeds = ['a', 'b', 'c', 'd']
+    bracket = Bracket(seeds, double_elimination=True)
+    outcomes, played = play_out(bracket, better_seed_wins(seeds))
+    assert bracket.get_champion(outcomes) == 'a'
+    assert ('GF', 'a', 'b') in played
+    assert 'GF2' not in [match_id for match_id, _, _ in played]
+    assert outcomes['GF2'].decided and outcomes['GF2'].winner == 'a'
+
+
+def test_losers_bracket_champion_winning_the_grand_final_forces_a_reset():
+    seeds = ['a', 'b', 'c', 'd']
+    bracket = Bracket(seeds, double_elimination=True)
+
+    def pick_winner(match, blue, orange):
+        # b loses to a in the winners bracket, but wins every other match
+        if match.match_id.startswith('W') and {blue, orange} == {'a', 'b'}:
+            return 'a'
+        return 'b' if 'b' in (blue, orange) else min(blue, orange, key=seeds.index)
+
+    outcomes, played = play_out(bracket, pick_winner)
+    assert played[-2:] == [('GF', 'a', 'b'), ('GF2', 'b', 'a')]
+    assert bracket.get_champion(outcomes) == 'b'
+
+
+def test_double_elimination_eliminates_bots_after_two_losses():
+    for bot_count in range(2, 13):
+        seeds = [f'bot{i}' for i in range(bot_count)]
+        bracket = Bracket(seeds, double_elimination=True)
+        rng = random.Random(bot_count)
+        outcomes, played = play_out(bracket, lambda match, blue, orange: rng.choice([blue, orange]))
+
+        losses = Counter(outcome.loser for outcome in outcomes.values() if outcome.loser is not None)
+        champion = bracket.get_champion(outcomes)
+        assert losses[champion] <= 1
+        assert all(losses[bot] == 2 for bot in seeds if bot != champion)
+        # Byes are never played
+        for match_id, blue, orange in played:
+            assert blue is not None and orange is not None
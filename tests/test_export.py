@@ -0,0 +1,99 @@
+import csv
+import gzip
+
+import pytest
+
+import autoleagueplay.export
+from autoleagueplay.export import EXPORT_COLUMNS, export_results, get_exported_index_path
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.paths import WorkingDir
+
+
+@pytest.fixture
+def working_dir(tmp_path) -> WorkingDir:
+    ladder_path = tmp_path / 'ladder.txt'
+    ladder_path.write_text('a\nb\nc\nd\n')
+    return WorkingDir(ladder_path)
+
+
+def add_result(working_dir: WorkingDir, name: str, blue: str, orange: str, blue_goals: int=1, orange_goals: int=0):
+    MatchResult(blue, orange, blue_goals, orange_goals, 0, 0, 0, 0, 0, 0, timestamp=1.0).write(
+        working_dir.match_results / name)
+
+
+def read_export(path):
+    with gzip.open(path, 'rt', newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_exports_every_result_once(working_dir):
+    add_result(working_dir, 'quantum_a_vs_b.json', 'a', 'b')
+    add_result(working_dir, 'a-2020-05-01T12-00-00_vs_b-2020-05-02T12-00-00.json', 'a', 'b', 0, 2)
+
+    assert export_results(working_dir) == 2
+    rows = read_export(working_dir.results_export)
+    assert rows[0] == EXPORT_COLUMNS
+    by_file = {row[0]: dict(zip(EXPORT_COLUMNS, row)) for row in rows[1:]}
+    assert by_file['quantum_a_vs_b.json']['division'] == 'quantum'
+    bubble = by_file['a-2020-05-01T12-00-00_vs_b-2020-05-02T12-00-00.json']
+    assert (bubble['division'], bubble['blue_version'], bubble['winner']) == ('', 'a-2020-05-01T12-00-00', 'b')
+
+    # Nothing new, so nothing is added
+    assert export_results(working_dir) == 0
+    assert len(read_export(working_dir.results_export)) == 3
+
+
+def test_resumes_with_only_the_new_results(working_dir):
+    add_result(working_dir, 'quantum_a_vs_b.json', 'a', 'b')
+    export_results(working_dir)
+    add_result(working_dir, 'quantum_a_vs_c.json', 'a', 'c')
+    add_result(working_dir, 'quantum_b_vs_c.json', 'b', 'c')
+
+    assert export_results(working_dir) == 2
+    rows = read_export(working_dir.results_export)
+    # A single header, even though the export was appended to
+    assert rows.count(EXPORT_COLUMNS) == 1
+    assert sorted(row[0] for row in rows[1:]) == ['quantum_a_vs_b.json', 'quantum_a_vs_c.json', 'quantum_b_vs_c.json']
+
+
+def test_resumes_after_an_interrupted_export(working_dir, monkeypatch):
+    for bot in 'bcd':
+        add_result(working_dir, f'quantum_a_vs_{bot}.json', 'a', bot)
+    monkeypatch.setattr(autoleagueplay.export, 'CHUNK_SIZE', 1)
+    original_write_chunk = autoleagueplay.export.write_chunk
+    calls = []
+
+    def failing_write_chunk(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        original_write_chunk(*args)
+
+    monkeypatch.setattr(autoleagueplay.export, 'write_chunk', failing_write_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        export_results(working_dir)
+    monkeypatch.setattr(autoleagueplay.export, 'write_chunk', original_write_chunk)
+
+    assert export_results(working_dir) == 2
+    rows = read_export(working_dir.results_export)
+    assert sorted(row[0] for row in rows[1:]) == ['quantum_a_vs_b.json', 'quantum_a_vs_c.json', 'quantum_a_vs_d.json']
+
+
+def test_starts_over_when_the_export_was_removed(working_dir):
+    add_result(working_dir, 'quantum_a_vs_b.json', 'a', 'b')
+    export_results(working_dir)
+    working_dir.results_export.unlink()
+
+    assert export_results(working_dir) == 1
+    assert len(read_export(working_dir.results_export)) == 2
+
+
+def test_never_touches_a_file_it_did_not_make(working_dir, tmp_path):
+    add_result(working_dir, 'quantum_a_vs_b.json', 'a', 'b')
+    export_path = tmp_path / 'mine.csv.gz'
+    export_path.write_bytes(b'precious')
+
+    with pytest.raises(FileExistsError):
+        export_results(working_dir, export_path)
+    assert export_path.read_bytes() == b'precious'
+    assert not get_exported_index_path(export_path).exists()
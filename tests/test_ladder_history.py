@@ -0,0 +1,70 @@
+import random
+
+from autoleagueplay.ladder import Ladder
+from autoleagueplay.ladder_history import KEYFRAME_INTERVAL, LadderHistory, apply_changes, compute_changes
+
+
+def round_trip(old_bots, new_bots):
+    bots = list(old_bots)
+    apply_changes(bots, compute_changes(old_bots, new_bots))
+    return bots
+
+
+def test_round_trip_of_simple_changes():
+    assert round_trip([], ['a', 'b']) == ['a', 'b']
+    assert round_trip(['a', 'b'], []) == []
+    assert round_trip(['a', 'b', 'c'], ['a', 'b', 'c']) == ['a', 'b', 'c']
+    assert round_trip(['a', 'b', 'c'], ['b', 'a', 'c']) == ['b', 'a', 'c']
+    assert round_trip(['a', 'b', 'c'], ['a', 'c']) == ['a', 'c']
+    assert round_trip(['a', 'b', 'c'], ['d', 'a', 'b', 'c']) == ['d', 'a', 'b', 'c']
+
+
+def test_a_bubble_sort_swap_is_a_single_change():
+    assert compute_changes(['a', 'b', 'c'], ['a', 'c', 'b']) == [['swap', 1, 2]]
+    assert compute_changes(['a', 'b'], ['a', 'b']) == []
+
+
+def test_round_trip_of_random_ladders():
+    rng = random.Random(0)
+    names = [f'bot{i}' for i in range(30)]
+    for _ in range(500):
+        old_bots = rng.sample(names, rng.randint(0, len(names)))
+        new_bots = rng.sample(names, rng.randint(0, len(names)))
+        assert round_trip(old_bots, new_bots) == new_bots
+
+
+def test_history_returns_the_ladder_at_any_time(tmp_path):
+    path = tmp_path / 'ladder_history.jsonl'
+    history = LadderHistory(path)
+    rng = random.Random(1)
+    bots = [f'bot{i}' for i in range(8)]
+    states = []
+    # More entries than a keyframe interval, so ladders are rebuilt from both keyframes and changes
+    for timestamp in range(1, 2 * KEYFRAME_INTERVAL + 10):
+        i = rng.randrange(len(bots) - 1)
+        bots[i], bots[i + 1] = bots[i + 1], bots[i]
+        assert history.record(Ladder(list(bots)), timestamp=timestamp)
+        states.append(list(bots))
+
+    # Read back from the file
+    history = LadderHistory(path)
+    assert history.ladder_at(0.5) is None
+    for timestamp, expected in enumerate(states, start=1):
+        assert history.ladder_at(timestamp).bots == expected
+        assert history.ladder_at(timestamp + 0.5).bots == expected
+
+
+def test_unchanged_ladder_is_not_recorded_unless_labelled(tmp_path):
+    history = LadderHistory(tmp_path / 'ladder_history.jsonl')
+    assert history.record(Ladder(['a', 'b']), timestamp=1)
+    assert not history.record(Ladder(['a', 'b']), timestamp=2)
+    assert history.record(Ladder(['a', 'b']), timestamp=3, label='week 1')
+
+
+def test_movement_since_an_earlier_time(tmp_path):
+    history = LadderHistory(tmp_path / 'ladder_history.jsonl')
+    history.record(Ladder(['a', 'b', 'c']), timestamp=1)
+    history.record(Ladder(['c', 'a', 'b', 'd']), timestamp=2)
+    assert history.movement(1, 2) == {'c': 2, 'a': -1, 'b': -1, 'd': None}
+    assert history.rank_at('c', 1) == 2
+    assert history.rank_at('d', 1) is None
@@ -0,0 +1,95 @@
+import gzip
+import json
+import shutil
+
+import pytest
+
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.replay_archive import ReplayArchive, RetentionPolicy, archive_replays
+
+
+@pytest.fixture
+def working_dir(tmp_path) -> WorkingDir:
+    ladder_path = tmp_path / 'ladder.txt'
+    ladder_path.write_text('a\nb\nc\nd\n')
+    return WorkingDir(ladder_path)
+
+
+@pytest.fixture
+def replay_dir(tmp_path):
+    path = tmp_path / 'demos'
+    path.mkdir()
+    return path
+
+
+def add_match(working_dir: WorkingDir, replay_dir, name: str, replay_id: str, timestamp: float, content: bytes):
+    MatchResult('a', 'b', 1, 0, 0, 0, 0, 0, 0, 0, replay_id=replay_id, timestamp=timestamp).write(
+        working_dir.match_results / name)
+    (replay_dir / f'{replay_id}.replay').write_bytes(content)
+
+
+def test_archiving_a_fresh_league_without_replays(working_dir, replay_dir):
+    archive_replays(working_dir, replay_dir, RetentionPolicy(budget_bytes=1024))
+    assert ReplayArchive(working_dir.replay_archive).replays == {}
+
+
+def test_moves_replays_into_the_archive(working_dir, replay_dir):
+    add_match(working_dir, replay_dir, 'quantum_a_vs_b.json', 'R1', 1.0, b'first replay' * 100)
+    # The same replay found again under another id is only stored once
+    add_match(working_dir, replay_dir, 'quantum_a_vs_c.json', 'R2', 2.0, b'first replay' * 100)
+    (replay_dir / 'unplayed.replay').write_bytes(b'no result yet')
+
+    archive_replays(working_dir, replay_dir, RetentionPolicy())
+
+    archive = ReplayArchive(working_dir.replay_archive)
+    assert len(archive.replays) == 1
+    replay = next(iter(archive.replays.values()))
+    assert sorted(replay.results) == ['quantum_a_vs_b.json', 'quantum_a_vs_c.json']
+    with gzip.open(archive.get_result_replay('quantum_a_vs_c.json'), 'rb') as f:
+        assert f.read() == b'first replay' * 100
+    assert [path.name for path in replay_dir.iterdir()] == ['unplayed.replay']
+
+
+def test_evicts_the_oldest_unprotected_replays(working_dir, replay_dir):
+    for i, name in enumerate(['quantum_a_vs_b.json', 'overclocked_a_vs_b.json', 'process_a_vs_b.json']):
+        add_match(working_dir, replay_dir, name, f'R{i}', float(i), bytes([i]) * 10000)
+    archive_replays(working_dir, replay_dir, RetentionPolicy())
+    archive = ReplayArchive(working_dir.replay_archive)
+    one_replay = max(replay.stored_size for replay in archive.replays.values())
+
+    policy = RetentionPolicy(budget_bytes=one_replay, protected_patterns=['quantum_*'])
+    archive_replays(working_dir, replay_dir, policy)
+
+    archive = ReplayArchive(working_dir.replay_archive)
+    # The oldest replay is protected, so the two after it are removed
+    assert [replay.results for replay in archive.replays.values()] == [['quantum_a_vs_b.json']]
+    assert len(list(working_dir.replay_archive.rglob('*.replay.gz'))) == 1
+
+
+def test_eviction_skips_replays_that_are_already_gone(working_dir, replay_dir):
+    for i in range(3):
+        add_match(working_dir, replay_dir, f'quantum_a_vs_{"bcd"[i]}.json', f'R{i}', float(i), bytes([i]) * 10000)
+    archive_replays(working_dir, replay_dir, RetentionPolicy())
+    archive = ReplayArchive(working_dir.replay_archive)
+    by_age = sorted(archive.replays, key=lambda content_hash: archive.replays[content_hash].timestamp)
+    # The oldest is removed by hand, and the next one with its whole directory
+    archive.get_replay_path(by_age[0]).unlink()
+    shutil.rmtree(archive.get_replay_path(by_age[1]).parent)
+
+    newest_size = archive.replays[by_age[2]].stored_size
+    evicted = archive.evict(RetentionPolicy(budget_bytes=newest_size), set())
+
+    assert sorted(evicted) == sorted(by_age[:2])
+    assert list(archive.replays) == [by_age[2]]
+    assert archive.get_replay_path(by_age[2]).exists()
+
+
+def test_index_is_only_written_when_the_replay_is_stored(working_dir, replay_dir):
+    add_match(working_dir, replay_dir, 'quantum_a_vs_b.json', 'R1', 1.0, b'replay')
+    archive_replays(working_dir, replay_dir, RetentionPolicy())
+    with open(working_dir.replay_archive / 'index.json', 'r') as f:
+        index = json.load(f)
+    content_hash, replay = next(iter(index.items()))
+    assert replay['replay_ids'] == ['R1']
+    assert ReplayArchive(working_dir.replay_archive).get_replay_path(content_hash).exists()
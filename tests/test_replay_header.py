@@ -0,0 +1,136 @@
+import os
+import struct
+from datetime import datetime
+
+import pytest
+
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.paths import WorkingDir
+from autoleagueplay.replay_header import ReplayParseError, read_replay_header
+from autoleagueplay.replay_index import check_result, get_bot_name, index_replays, rebuild_result
+
+
+def encode_string(value: str) -> bytes:
+    if value.isascii():
+        data = value.encode('latin-1') + b'\0'
+        return struct.pack('<i', len(data)) + data
+    data = value.encode('utf-16-le') + b'\0\0'
+    return struct.pack('<i', -(len(data) // 2)) + data
+
+
+def encode_property(name: str, value) -> bytes:
+    if isinstance(value, bool):
+        kind, data = 'BoolProperty', bytes([value])
+    elif isinstance(value, int):
+        kind, data = 'IntProperty', struct.pack('<i', value)
+    elif isinstance(value, float):
+        kind, data = 'FloatProperty', struct.pack('<f', value)
+    elif isinstance(value, tuple):
+        # A byte property is stored as its kind and value
+        kind, data = 'ByteProperty', b''.join(encode_string(part) for part in value)
+    elif isinstance(value, list):
+        kind, data = 'ArrayProperty', struct.pack('<i', len(value)) + b''.join(encode_properties(item) for item in value)
+    else:
+        kind, data = 'StrProperty', encode_string(value)
+    return encode_string(name) + encode_string(kind) + struct.pack('<Q', len(data)) + data
+
+
+def encode_properties(properties: dict) -> bytes:
+    return b''.join(encode_property(name, value) for name, value in properties.items()) + encode_string('None')
+
+
+def write_replay(path, properties: dict, class_name: str='TAGame.Replay_Soccar_TA'):
+    body = struct.pack('<II', 868, 18) + struct.pack('<I', 0) + encode_string(class_name) + \
+        encode_properties(properties)
+    # The network data after the header is not read
+    path.write_bytes(struct.pack('<iI', len(body), 0) + body + b'\xff' * 64)
+
+
+def player(name: str, team: int, score: int=0, goals: int=0, shots: int=0, saves: int=0) -> dict:
+    return {'Name': name, 'Platform': ('OnlinePlatform', 'OnlinePlatform_Steam'), 'bBot': True, 'Team': team,
+            'Score': score, 'Goals': goals, 'Shots': shots, 'Saves': saves}
+
+
+def test_reads_the_match_from_the_header(tmp_path):
+    path = tmp_path / 'ABCD1234.replay'
+    write_replay(path, {
+        'TeamSize': 1,
+        'Team0Score': 3,
+        'Date': '2019-05-20 18-00-00',
+        'RecordFPS': 30.0,
+        'Goals': [{'PlayerName': 'Botimus', 'PlayerTeam': 0, 'frame': 120}],
+        'PlayerStats': [player('Botimus', 0, 420, 3, 5, 1), player('Beast from the East', 1, 210, 0, 2, 4)],
+    })
+
+    header = read_replay_header(path)
+    assert header.replay_id == 'ABCD1234'
+    assert header.date == datetime(2019, 5, 20, 18, 0, 0)
+    assert header.team_size == 1
+    # The orange score is left out because it is 0
+    assert (header.blue_score, header.orange_score) == (3, 0)
+    assert [p.name for p in header.team_players(0)] == ['Botimus']
+    assert header.team_players(1)[0].saves == 4
+    assert header.goals[0].frame == 120
+
+
+def test_reads_utf16_names_and_odd_dates(tmp_path):
+    path = tmp_path / 'replay.replay'
+    write_replay(path, {'Date': 'not a date', 'PlayerStats': [player('Bøt ☃', 0)]})
+    header = read_replay_header(path)
+    assert header.date is None
+    assert header.players[0].name == 'Bøt ☃'
+
+
+def test_rejects_other_replays_and_broken_files(tmp_path):
+    path = tmp_path / 'hoops.replay'
+    write_replay(path, {}, class_name='TAGame.Replay_Basket_TA')
+    with pytest.raises(ReplayParseError):
+        read_replay_header(path)
+
+    path = tmp_path / 'truncated.replay'
+    write_replay(path, {'PlayerStats': [player('Botimus', 0)]})
+    path.write_bytes(path.read_bytes()[:40])
+    with pytest.raises(ReplayParseError):
+        read_replay_header(path)
+
+
+def test_rebuilds_and_checks_results(tmp_path):
+    path = tmp_path / 'replay.replay'
+    write_replay(path, {'Team0Score': 2, 'Team1Score': 1, 'Date': '2019-05-20 18-00-00',
+                        'PlayerStats': [player('Botimus (2)', 0, 300, 2, 4, 0), player('Atlas', 1, 100, 1, 1, 3)]})
+    header = read_replay_header(path)
+    assert get_bot_name('Botimus (2)') == 'Botimus'
+
+    result = rebuild_result(header)
+    assert (result.blue, result.orange, result.blue_goals, result.orange_goals) == ('Botimus', 'Atlas', 2, 1)
+    assert (result.blue_shots, result.orange_saves, result.blue_points) == (4, 3, 300)
+    assert check_result(result, header) == []
+
+    wrong = MatchResult('Atlas', 'Botimus', 1, 1, 0, 0, 0, 0, 0, 0)
+    assert len(check_result(wrong, header)) == 3
+
+
+def test_rebuild_skips_old_replays_and_conflicts(tmp_path):
+    ladder_path = tmp_path / 'ladder.txt'
+    ladder_path.write_text('a\nb\nc\nd\n')
+    ladder_time = datetime(2019, 5, 20, 12, 0, 0).timestamp()
+    os.utime(ladder_path, (ladder_time, ladder_time))
+    working_dir = WorkingDir(ladder_path)
+    replay_dir = tmp_path / 'demos'
+    replay_dir.mkdir()
+
+    def write_match(replay_id, date, blue, orange):
+        write_replay(replay_dir / f'{replay_id}.replay', {'Team0Score': 1, 'Date': date,
+                                                          'PlayerStats': [player(blue, 0), player(orange, 1)]})
+
+    # Played in an earlier week
+    write_match('old', '2019-05-13 18-00-00', 'a', 'b')
+    # Two replays of the same pairing this week
+    write_match('first', '2019-05-20 18-00-00', 'a', 'c')
+    write_match('second', '2019-05-20 18-10-00', 'a', 'c')
+    write_match('single', '2019-05-20 18-20-00', 'a', 'd')
+
+    index_replays(working_dir, replay_dir, rebuild=True)
+    assert not working_dir.get_match_result(0, 'a', 'b').exists()
+    assert not working_dir.get_match_result(0, 'a', 'c').exists()
+    assert MatchResult.read(working_dir.get_match_result(0, 'a', 'd')).replay_id == 'single'
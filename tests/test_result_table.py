@@ -0,0 +1,71 @@
+import random
+
+from autoleagueplay.match_result import CombinedScore, MatchResult
+from autoleagueplay.result_table import ResultTable, ResultTableBuilder
+
+
+def random_results(rng: random.Random, bots, count: int):
+    results = []
+    for _ in range(count):
+        # Bots can play themselves, e.g. in a test league
+        blue, orange = rng.choice(bots), rng.choice(bots)
+        results.append(MatchResult(blue, orange, *(rng.randint(0, 8) for _ in range(8)),
+                                   replay_id=rng.choice([None, f'replay{rng.randint(0, 999)}']),
+                                   timestamp=rng.choice([None, rng.uniform(0, 1e9)]),
+                                   shortened=rng.random() < 0.2, poor_pacing=rng.random() < 0.1,
+                                   duration=rng.choice([None, rng.uniform(60, 900)])))
+    return results
+
+
+def score_tuple(score: CombinedScore):
+    return score.bot, score.goal_diff, score.goals, score.shots, score.saves, score.points
+
+
+def test_aggregate_matches_calc_score():
+    rng = random.Random(0)
+    bots = [f'bot{i}' for i in range(10)]
+    results = random_results(rng, bots, 300)
+    table = ResultTable.from_results(results)
+    # Includes a bot that never played
+    expected_bots = bots + ['absent']
+
+    scores = table.aggregate(expected_bots)
+    assert list(scores) == expected_bots
+    for bot in expected_bots:
+        assert score_tuple(scores[bot]) == score_tuple(CombinedScore.calc_score(bot, results))
+
+
+def test_aggregate_of_a_group_matches_calc_score_of_its_results():
+    rng = random.Random(1)
+    bots = [f'bot{i}' for i in range(6)]
+    builder = ResultTableBuilder()
+    results_by_group = {'quantum': [], 'overclocked': [], None: []}
+    for result in random_results(rng, bots, 200):
+        group = rng.choice(list(results_by_group))
+        builder.add(result, group)
+        results_by_group[group].append(result)
+    table = builder.build()
+
+    for group, group_results in results_by_group.items():
+        scores = table.aggregate(bots, table.get_group_mask(group))
+        for bot in bots:
+            assert score_tuple(scores[bot]) == score_tuple(CombinedScore.calc_score(bot, group_results))
+    assert not table.get_group_mask('unknown').any()
+
+
+def test_results_survive_the_table():
+    rng = random.Random(2)
+    results = random_results(rng, ['a', 'b', 'c'], 50)
+    for original, copy in zip(results, ResultTable.from_results(results).to_results()):
+        original_dict, copy_dict = dict(original.__dict__), dict(copy.__dict__)
+        # Frame pacing is not stored in the table
+        original_dict.pop('frame_pacing')
+        copy_dict.pop('frame_pacing')
+        assert copy_dict == original_dict
+
+
+def test_empty_table():
+    table = ResultTable.from_results([])
+    assert len(table) == 0
+    assert table.get_bots() == []
+    assert score_tuple(table.aggregate(['a'])['a']) == ('a', 0, 0, 0, 0, 0)
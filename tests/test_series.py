@@ -0,0 +1,55 @@
+from autoleagueplay.match_result import MatchResult
+from autoleagueplay.series import SeriesPolicy, get_goal_diff, get_series_winner
+
+
+def make_result(blue: str, orange: str, blue_goals: int, orange_goals: int) -> MatchResult:
+    return MatchResult(blue, orange, blue_goals, orange_goals, 0, 0, 0, 0, 0, 0)
+
+
+def test_goal_diff_is_from_the_point_of_view_of_the_bot():
+    result = make_result('Lower', 'Upper', 3, 1)
+    assert get_goal_diff('lower', result) == 2
+    assert get_goal_diff('upper', result) == -2
+
+
+def test_no_games_has_no_winner():
+    assert get_series_winner('upper', 'lower', []) is None
+
+
+def test_lower_bot_wins_with_a_better_goal_diff():
+    # The lower bot plays blue
+    results = [make_result('lower', 'upper', 2, 1)]
+    assert get_series_winner('upper', 'lower', results) == 'lower'
+
+
+def test_upper_bot_keeps_its_place_on_a_tie():
+    assert get_series_winner('upper', 'lower', [make_result('lower', 'upper', 1, 1)]) == 'upper'
+    # Ties over a series too, even though the lower bot won more games
+    results = [make_result('lower', 'upper', 1, 0), make_result('lower', 'upper', 1, 0),
+               make_result('lower', 'upper', 0, 2)]
+    assert get_series_winner('upper', 'lower', results) == 'upper'
+
+
+def test_series_is_won_by_total_goal_diff_not_by_games():
+    results = [make_result('lower', 'upper', 0, 1), make_result('lower', 'upper', 0, 1),
+               make_result('lower', 'upper', 5, 0)]
+    assert get_series_winner('upper', 'lower', results) == 'lower'
+
+
+def test_bot_names_are_matched_case_insensitively():
+    results = [make_result('Lower', 'Upper', 3, 0)]
+    assert get_series_winner('upper', 'lower', results) == 'lower'
+
+
+def test_single_game_series_is_decided_after_one_game():
+    policy = SeriesPolicy(max_games=1)
+    assert not policy.is_decided([])
+    assert policy.is_decided([0])
+
+
+def test_close_series_goes_on_and_lopsided_series_stops_early():
+    policy = SeriesPolicy(max_games=5)
+    assert not policy.is_decided([1])
+    assert policy.is_decided([4])
+    assert policy.is_decided([-4])
+    assert policy.is_decided([1, -1, 1, -1, 0])